@@ -0,0 +1,86 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+from pymongo.errors import PyMongoError
+
+import crud
+
+# --- Налаштування ---
+# Як часто запускати архівацію програм, що вийшли в ефір (за замовчуванням - щогодини;
+# 0 вимикає фонову архівацію, лишається `python manage.py archive` чи cron).
+# Паралельні архівації з кількох воркерів безпечні (видалення умовне за revision),
+# але кожна збільшує навантаження записом - на великих розгортаннях лишайте її на одному воркері.
+PROGRAM_ARCHIVE_INTERVAL_SECONDS = float(os.getenv("PROGRAM_ARCHIVE_INTERVAL_SECONDS", 3600))
+# Пауза після старту, щоб архівація не змагалася з прогрівом кешів
+PROGRAM_ARCHIVE_START_DELAY_SECONDS = float(os.getenv("PROGRAM_ARCHIVE_START_DELAY_SECONDS", 60))
+
+class Archiver:
+    """Фонова задача, що періодично переносить старі програми в архів (див. crud.archive_aired_programs)."""
+
+    def __init__(self, interval: float = PROGRAM_ARCHIVE_INTERVAL_SECONDS, start_delay: float = PROGRAM_ARCHIVE_START_DELAY_SECONDS):
+        self.interval = interval
+        self.start_delay = start_delay
+        self.runs = 0
+        self.failures = 0
+        self.archived_total = 0
+        self.last_archived = 0
+        self.last_run_seconds: Optional[float] = None
+        self.last_run_at: Optional[float] = None
+
+    async def run_once(self) -> int:
+        started = time.perf_counter()
+        archived = await crud.archive_aired_programs()
+        self.runs += 1
+        self.last_archived = archived
+        self.archived_total += archived
+        self.last_run_seconds = time.perf_counter() - started
+        self.last_run_at = time.time()
+        if archived:
+            print(f"Архівовано {archived} програм за {self.last_run_seconds:.1f} с.")
+        return archived
+
+    async def run(self) -> None:
+        await asyncio.sleep(self.start_delay)
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except PyMongoError as e:
+                self.failures += 1
+                print(f"Архівацію програм перервано: {e}. Наступна спроба через {self.interval} с.")
+            await asyncio.sleep(self.interval)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.interval > 0,
+            "retention_days": crud.PROGRAM_ARCHIVE_AFTER_DAYS,
+            "runs": self.runs,
+            "failures": self.failures,
+            "archived_total": self.archived_total,
+            "last_archived": self.last_archived,
+            "last_run_seconds": round(self.last_run_seconds, 3) if self.last_run_seconds is not None else None,
+            "last_run_at": self.last_run_at,
+        }
+
+archiver = Archiver()
+
+_task: Optional[asyncio.Task] = None
+
+def start_archiver() -> None:
+    """Запускає фонову архівацію (викликається при старті застосунку)."""
+    global _task
+    if archiver.interval <= 0 or _task is not None:
+        return
+    _task = asyncio.create_task(archiver.run())
+
+async def stop_archiver() -> None:
+    """Зупиняє фонову архівацію (незавершену пачку наступний запуск перенесе повторно)."""
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    await asyncio.gather(_task, return_exceptions=True)
+    _task = None
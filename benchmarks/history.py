@@ -0,0 +1,214 @@
+"""
+Бенчмарк гарячої/холодної колекції програм: як затримка "живих" запитів і розмір індексів
+programs змінюються з накопиченням історії - без архівації і з архівацією в programs_archive.
+
+Для кожного кроку історії (кількість програм, що вже вийшли в ефір) додає історію в programs,
+за потреби запускає crud.archive_aired_programs і вимірює:
+  - розмір індексів programs і programs_archive (collStats),
+  - p50/p95 живих маршрутів: сітка на найближчі години, "зараз / далі", доба каналу, експорт вікна.
+Кеш відповідей вимкнено (RESPONSE_CACHE_TTL_SECONDS=0), щоб вимірювати саме читання з бази.
+
+Приклади:
+    python benchmarks/history.py --backend mongod --history 0 --history 50000 --history 200000
+    python benchmarks/history.py --backend uri --mongo-uri mongodb://localhost:27017 --output archive.json
+Потрібен справжній MongoDB: mongomock не підтримує collStats і частину операцій архівації.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from load import LocalMongod, _git_commit, configure_environment, connect, summarize
+
+os.environ.setdefault("RESPONSE_CACHE_TTL_SECONDS", "0")
+
+PROGRAM_DURATION = timedelta(minutes=30)
+INSERT_BATCH_SIZE = 5000
+
+def _utcnow() -> datetime:
+    return datetime.utcnow().replace(second=0, microsecond=0)
+
+async def create_channels(count: int) -> List:
+    import crud
+    import schemas
+    return [await crud.create_channel(schemas.TVChannelCreate(name=f"Archive Bench {i}", country="UA")) for i in range(count)]
+
+async def insert_programs(channels: List, start: datetime, per_channel: int, prefix: str) -> None:
+    """Пише програми напряму в programs (без перевірок crud) - так швидко накопичується історія."""
+    from bson import DBRef
+    from models import TVChannel, TVProgram
+
+    collection = TVProgram.get_motor_collection()
+    batch = []
+    for channel in channels:
+        for i in range(per_channel):
+            program_start = start + PROGRAM_DURATION * i
+            batch.append({
+                "title": f"{prefix} {i}",
+                "description": f"Synthetic {prefix.lower()} programme {i}",
+                "start_time": program_start,
+                "end_time": program_start + PROGRAM_DURATION,
+                "channel": DBRef(TVChannel.get_collection_name(), channel.id),
+                "tags": ["news" if i % 2 else "film"],
+                "channel_snapshot": None,
+                "revision": 0,
+            })
+            if len(batch) >= INSERT_BATCH_SIZE:
+                await collection.insert_many(batch, ordered=False)
+                batch = []
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+
+async def index_sizes() -> Dict[str, int]:
+    import database
+    from models import ArchivedTVProgram, TVProgram
+
+    sizes: Dict[str, int] = {}
+    db = database.get_client()[os.environ["DATABASE_NAME"]]
+    for model in (TVProgram, ArchivedTVProgram):
+        name = model.get_collection_name()
+        stats = await db.command("collStats", name)
+        sizes[name] = stats.get("totalIndexSize")
+    return sizes
+
+def live_requests(channel_ids: List[str], now: datetime) -> Dict[str, Callable[[int], Tuple[str, dict]]]:
+    """Маршрути, які читають лише гарячі дані (вікно навколо поточного часу)."""
+    def iso(value: datetime) -> str:
+        return value.isoformat()
+
+    return {
+        "GET /schedule (now ± 3h)": lambda i: ("/schedule", {"from": iso(now - timedelta(hours=3)), "to": iso(now + timedelta(hours=3))}),
+        "GET /schedule/now": lambda i: ("/schedule/now", {}),
+        "GET /channels/{id}/days/{today}": lambda i: (f"/channels/{channel_ids[i % len(channel_ids)]}/days/{now.date().isoformat()}", {}),
+        "GET /programs/export (next 6h)": lambda i: ("/programs/export", {"format": "ndjson", "from": iso(now), "to": iso(now + timedelta(hours=6))}),
+    }
+
+async def measure(client, channel_ids: List[str], now: datetime, requests: int, concurrency: int) -> dict:
+    results = {}
+    for name, build in live_requests(channel_ids, now).items():
+        latencies: List[float] = []
+        errors = 0
+        counter = iter(range(requests))
+
+        async def worker() -> None:
+            nonlocal errors
+            for i in counter:
+                url, params = build(i)
+                started = time.perf_counter()
+                response = await client.get(url, params=params)
+                await response.aread()
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        results[name] = summarize(latencies, errors, time.perf_counter() - started)
+    return results
+
+async def run_mode(args, archive: bool) -> List[dict]:
+    """Один прохід по кроках історії: з архівацією після кожного кроку або без неї."""
+    import httpx
+    import crud
+    import main
+    from cache import channel_catalog
+    from models import ChannelDay
+
+    await connect(args.backend)
+    channels = await create_channels(args.channels)
+    await channel_catalog.load() # Каталог міг лишитися від попереднього проходу з іншою базою
+    channel_ids = [str(channel.id) for channel in channels]
+    now = _utcnow()
+    # Гарячі дані: live програм на канал, починаючи з доби тому
+    await insert_programs(channels, now - timedelta(days=1), args.live, "Live")
+
+    cutoff = crud.archive_cutoff(now)
+    inserted = 0
+    steps = []
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for history in sorted(args.history):
+            # Нова історія закінчується перед межею архівації і тягнеться в минуле
+            per_channel = (history - inserted) // len(channels)
+            if per_channel > 0:
+                await insert_programs(channels, cutoff - PROGRAM_DURATION * (inserted // len(channels) + per_channel), per_channel, "Aired")
+                inserted += per_channel * len(channels)
+            archive_seconds = None
+            if archive:
+                started = time.perf_counter()
+                await crud.archive_aired_programs(cutoff=cutoff, pause_seconds=0)
+                archive_seconds = round(time.perf_counter() - started, 3)
+            # Доби каналу будуються першим читанням - скидаємо, щоб кожен крок міряв однаково
+            await ChannelDay.get_motor_collection().delete_many({})
+            step = {
+                "history_programs": inserted,
+                "archive_seconds": archive_seconds,
+                "index_bytes": await index_sizes(),
+                "endpoints": await measure(client, channel_ids, now, args.requests, args.concurrency),
+            }
+            print(f"{'archive' if archive else 'no-archive':>10} history={inserted:<8} {json.dumps(step['index_bytes'])} "
+                  + " ".join(f"{name}: p50={r['p50_ms']}ms" for name, r in step["endpoints"].items()), file=sys.stderr)
+            steps.append(step)
+    return steps
+
+async def run_benchmark(args) -> dict:
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "backend": args.backend,
+        "config": {
+            "channels": args.channels,
+            "live_programs_per_channel": args.live,
+            "history_steps": sorted(args.history),
+            "requests_per_endpoint": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "without_archive": await run_mode(args, archive=False),
+        "with_archive": await run_mode(args, archive=True),
+    }
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Бенчмарк архівації програм (гаряча/холодна колекція)")
+    parser.add_argument("--backend", choices=["mongod", "uri"], default="mongod",
+                        help="mongod - тимчасовий локальний mongod, uri - існуюча база")
+    parser.add_argument("--mongo-uri", default=os.getenv("BENCH_MONGODB_URI", "mongodb://127.0.0.1:27017"))
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--live", type=int, default=200, help="Гарячих програм на канал (по 30 хвилин від доби тому)")
+    parser.add_argument("--history", type=int, action="append", help="Загальна кількість програм в історії на кроці (можна повторювати)")
+    parser.add_argument("--requests", type=int, default=200, help="Кількість запитів на кожен маршрут")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", help="Файл для JSON-звіту (за замовчуванням stdout)")
+    args = parser.parse_args()
+    args.history = args.history or [0, 20000, 100000]
+    return args
+
+def main() -> None:
+    args = parse_args()
+    mongod = None
+    if args.backend == "mongod":
+        mongod = LocalMongod()
+        mongod.start()
+        configure_environment(mongod.uri)
+    else:
+        configure_environment(args.mongo_uri)
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            report = asyncio.run(run_benchmark(args))
+    finally:
+        if mongod is not None:
+            mongod.stop()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
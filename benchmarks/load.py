@@ -0,0 +1,431 @@
+"""
+Навантажувальний бенчмарк усіх маршрутів API.
+
+Піднімає базу (локальний mongod з PATH, вказаний MongoDB URI або in-process mongomock),
+генерує синтетичні дані через шар crud (N каналів x M програм x U користувачів)
+і проганяє кожен маршрут з routes.py із заданою конкурентністю прямо через ASGI-застосунок.
+Результат - JSON з пропускною здатністю та p50/p95/p99 для кожного маршруту,
+який можна порівнювати між комітами.
+
+Приклади:
+    python benchmarks/load.py --backend mongod --channels 20 --programs 500 --requests 500 --concurrency 32
+    python benchmarks/load.py --backend uri --mongo-uri mongodb://localhost:27017 --output bench.json
+    python benchmarks/load.py --backend inprocess --only "GET /programs/" --only "GET /channels/"
+    # Вартість автентифікації: без кешу користувачів (TTL 0) і з ним
+    AUTH_CACHE_TTL_SECONDS=0 python benchmarks/load.py --backend inprocess --only "GET /users/me" --only "PATCH /programs/{id}"
+    # Затримка GET /schedule/now під час шквалу логінів (bcrypt не має блокувати event loop)
+    python benchmarks/load.py --backend inprocess --only "GET /" --requests 40 --concurrency 8 --login-storm
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BENCH_DATABASE = "tv_program_benchmark"
+BENCH_PASSWORD = "benchmark-password"
+SCHEDULE_START = datetime(2024, 1, 1)
+PROGRAM_DURATION = timedelta(minutes=30)
+# Перші слоти (по PROGRAM_DURATION від SCHEDULE_START) для рядків сценаріїв запису.
+# Діапазони не перетинаються з основною сіткою (слоти 0..programs-1) і між собою,
+# тож за політики перетинів reject записи не відхиляються з 409.
+CREATED_SLOTS = 1_000_000
+BULK_SLOTS = 2_000_000
+DELETABLE_SLOTS = 3_000_000
+UPDATED_SLOTS = 4_000_000
+XMLTV_SLOTS = 5_000_000
+
+# --- База даних для бенчмарку ---
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+class LocalMongod:
+    """Тимчасовий mongod у порожній теці (знищується після бенчмарку)."""
+
+    def __init__(self):
+        self.dbpath = tempfile.mkdtemp(prefix="tv-bench-mongod-")
+        self.port = _free_port()
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def uri(self) -> str:
+        return f"mongodb://127.0.0.1:{self.port}"
+
+    def start(self) -> None:
+        mongod = shutil.which("mongod")
+        if mongod is None:
+            raise RuntimeError("mongod не знайдено в PATH")
+        self.process = subprocess.Popen(
+            [mongod, "--dbpath", self.dbpath, "--port", str(self.port), "--bind_ip", "127.0.0.1", "--quiet"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.5):
+                    return
+            except OSError:
+                time.sleep(0.1)
+        raise RuntimeError("mongod не запустився за 30 секунд")
+
+    def stop(self) -> None:
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait()
+        shutil.rmtree(self.dbpath, ignore_errors=True)
+
+def configure_environment(mongo_uri: str) -> None:
+    """Налаштування застосунку мають бути в оточенні до імпорту його модулів."""
+    os.environ["MONGODB_URI"] = mongo_uri
+    os.environ["DATABASE_NAME"] = BENCH_DATABASE
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+
+async def connect(backend: str) -> None:
+    import database
+    if backend == "inprocess":
+        # mongomock не підтримує частину операторів ($text, $getField), такі маршрути покажуть помилки
+        from beanie import init_beanie
+        from mongomock_motor import AsyncMongoMockClient
+        database.client = AsyncMongoMockClient()
+        await init_beanie(database=database.client[BENCH_DATABASE], document_models=database.DOCUMENT_MODELS)
+    else:
+        await database.init_db_connection(fast_start=False, sync_indexes=True, seed=False)
+        await database.get_client().drop_database(BENCH_DATABASE)
+        await database.init_db_connection(fast_start=False, sync_indexes=True, seed=False)
+
+# --- Синтетичні дані ---
+
+@dataclass
+class Dataset:
+    channel_ids: List[str]
+    program_ids: List[str]
+    deletable_program_ids: List[str]
+    usernames: List[str]
+    admin_token: str = ""
+    user_token: str = ""
+
+def program_row(channel_id: str, index: int, title_prefix: str = "Program") -> dict:
+    start = SCHEDULE_START + PROGRAM_DURATION * index
+    return {
+        "title": f"{title_prefix} {index}",
+        "description": f"Synthetic programme number {index} for load testing",
+        "start_time": start,
+        "end_time": start + PROGRAM_DURATION,
+        "channel_id": channel_id,
+        "tags": ["news" if index % 2 else "film", f"tag{index % 10}"],
+    }
+
+async def generate_dataset(channels: int, programs: int, users: int, deletable: int) -> Dataset:
+    import crud
+    import schemas
+    from models import TVProgram
+
+    if programs > CREATED_SLOTS:
+        raise ValueError(f"Не більше {CREATED_SLOTS} програм на канал")
+    channel_ids = []
+    for i in range(channels):
+        channel = await crud.create_channel(schemas.TVChannelCreate(name=f"Bench Channel {i}", country="UA"))
+        channel_ids.append(str(channel.id))
+
+    rows = (
+        (row, program_row(channel_ids[row % channels], row // channels))
+        for row in range(channels * programs)
+    )
+    report = await crud.bulk_create_tv_programs(rows)
+    if report["failed"]:
+        raise RuntimeError(f"Не вдалося згенерувати програми: {report['errors'][:3]}")
+
+    # Окремі програми для DELETE, щоб не видаляти ті, що читають інші сценарії
+    deletable_rows = ((i, program_row(channel_ids[i % channels], DELETABLE_SLOTS + i, "Deletable")) for i in range(deletable))
+    report = await crud.bulk_create_tv_programs(deletable_rows)
+    if report["failed"]:
+        raise RuntimeError(f"Не вдалося згенерувати програми для DELETE: {report['errors'][:3]}")
+
+    documents = await TVProgram.get_motor_collection().find({}, {"_id": 1, "title": 1}).to_list(length=None)
+    program_ids = [str(d["_id"]) for d in documents if not d["title"].startswith("Deletable")]
+    deletable_ids = [str(d["_id"]) for d in documents if d["title"].startswith("Deletable")]
+
+    usernames = []
+    for i in range(users):
+        role = "admin" if i == 0 else "user"
+        user = await crud.create_user(schemas.UserCreate(username=f"bench-{role}-{i}", password=BENCH_PASSWORD, role=role))
+        usernames.append(user.username)
+    return Dataset(channel_ids, program_ids, deletable_ids, usernames)
+
+# --- Сценарії ---
+
+RequestSpec = Tuple[str, str, Dict[str, Any]]
+
+@dataclass
+class Scenario:
+    name: str
+    build: Callable[[Dataset, int], RequestSpec]
+
+def _pick(items: List[str], i: int) -> str:
+    return items[i % len(items)]
+
+def _auth(token: str) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {token}"}
+
+def _iso(value: datetime) -> str:
+    return value.isoformat()
+
+def _xmltv_document(channel_id: str, i: int) -> bytes:
+    start = SCHEDULE_START + PROGRAM_DURATION * (XMLTV_SLOTS + i * 20)
+    programmes = "".join(
+        f'<programme start="{(start + PROGRAM_DURATION * n):%Y%m%d%H%M%S} +0000" '
+        f'stop="{(start + PROGRAM_DURATION * (n + 1)):%Y%m%d%H%M%S} +0000" channel="{channel_id}">'
+        f"<title>XMLTV {i}-{n}</title><desc>Bulk</desc></programme>"
+        for n in range(20)
+    )
+    return f'<?xml version="1.0"?><tv>{programmes}</tv>'.encode()
+
+def build_scenarios() -> List[Scenario]:
+    window_from = SCHEDULE_START + timedelta(hours=6)
+    window_to = window_from + timedelta(hours=12)
+
+    def admin(d: Dataset) -> Dict[str, str]:
+        return _auth(d.admin_token)
+
+    return [
+        Scenario("GET /", lambda d, i: ("GET", "/", {})),
+        Scenario("GET /health/live", lambda d, i: ("GET", "/health/live", {})),
+        Scenario("GET /health/ready", lambda d, i: ("GET", "/health/ready", {})),
+        Scenario("GET /stats", lambda d, i: ("GET", "/stats", {})),
+        Scenario("GET /metrics", lambda d, i: ("GET", "/metrics", {})),
+        # /live/events та /live/ws - довгі з'єднання, їхня затримка в цьому бенчмарку не має сенсу
+        Scenario("GET /live/stats", lambda d, i: ("GET", "/live/stats", {})),
+        Scenario("POST /auth/register", lambda d, i: (
+            "POST", "/auth/register",
+            {"json": {"username": f"bench-register-{time.time_ns()}-{i}", "password": BENCH_PASSWORD}},
+        )),
+        Scenario("POST /auth/token", lambda d, i: (
+            "POST", "/auth/token",
+            {"data": {"username": _pick(d.usernames, i), "password": BENCH_PASSWORD}},
+        )),
+        Scenario("GET /users/me", lambda d, i: ("GET", "/users/me", {"headers": _auth(d.user_token)})),
+        Scenario("GET /programs/", lambda d, i: ("GET", "/programs/", {"params": {"limit": 100}})),
+        Scenario("GET /programs/ fields", lambda d, i: (
+            "GET", "/programs/", {"params": {"limit": 100, "fields": "id,title,start_time,channel.name"}},
+        )),
+        Scenario("GET /programs/ gzip", lambda d, i: (
+            "GET", "/programs/", {"params": {"limit": 1000}, "headers": {"Accept-Encoding": "gzip"}},
+        )),
+        Scenario("GET /programs/ ndjson", lambda d, i: ("GET", "/programs/", {"params": {"format": "ndjson"}})),
+        Scenario("GET /programs/{id}", lambda d, i: ("GET", f"/programs/{_pick(d.program_ids, i)}", {})),
+        Scenario("POST /programs/batch", lambda d, i: (
+            "POST", "/programs/batch", {"json": {"ids": [_pick(d.program_ids, i + n) for n in range(50)]}},
+        )),
+        Scenario("GET /programs/search", lambda d, i: (
+            "GET", "/programs/search", {"params": {"q": f"programme {i % 50}", "tags": "news"}},
+        )),
+        Scenario("GET /programs/export", lambda d, i: (
+            "GET", "/programs/export",
+            {"params": {"format": "csv", "from": _iso(window_from), "to": _iso(window_to)},
+             "headers": {"Accept-Encoding": "gzip"}},
+        )),
+        Scenario("GET /schedule", lambda d, i: (
+            "GET", "/schedule", {"params": {"from": _iso(window_from), "to": _iso(window_to)}},
+        )),
+        Scenario("GET /schedule/now", lambda d, i: ("GET", "/schedule/now", {})),
+        Scenario("GET /channels/", lambda d, i: ("GET", "/channels/", {})),
+        Scenario("GET /channels/{id}", lambda d, i: ("GET", f"/channels/{_pick(d.channel_ids, i)}", {})),
+        Scenario("GET /channels/{id}/days/{day}", lambda d, i: (
+            "GET", f"/channels/{_pick(d.channel_ids, i)}/days/{(SCHEDULE_START + timedelta(days=i % 3)).date()}", {},
+        )),
+        Scenario("POST /channels/", lambda d, i: (
+            "POST", "/channels/",
+            {"json": {"name": f"Bench New Channel {time.time_ns()}-{i}", "country": "UA"}, "headers": admin(d)},
+        )),
+        Scenario("PUT /channels/{id}", lambda d, i: (
+            "PUT", f"/channels/{d.channel_ids[0]}",
+            {"json": {"name": "Bench Channel 0", "country": "UA" if i % 2 else "PL"}, "headers": admin(d)},
+        )),
+        Scenario("POST /programs/", lambda d, i: (
+            "POST", "/programs/",
+            {"json": _jsonable(program_row(_pick(d.channel_ids, i), CREATED_SLOTS + i, "Created")), "headers": admin(d)},
+        )),
+        # Кожне оновлення переносить програму у свій вільний слот
+        Scenario("PUT /programs/{id}", lambda d, i: (
+            "PUT", f"/programs/{_pick(d.program_ids, i)}",
+            {"json": _jsonable(program_row(_pick(d.channel_ids, i), UPDATED_SLOTS + i, "Updated")), "headers": admin(d)},
+        )),
+        Scenario("PATCH /programs/{id}", lambda d, i: (
+            "PATCH", f"/programs/{_pick(d.program_ids, i)}",
+            {"json": {"title": f"Patched {i}"}, "headers": admin(d)},
+        )),
+        Scenario("DELETE /programs/{id}", lambda d, i: (
+            "DELETE", f"/programs/{_pick(d.deletable_program_ids, i)}", {"headers": admin(d)},
+        )),
+        Scenario("POST /programs/bulk", lambda d, i: (
+            "POST", "/programs/bulk",
+            {"json": [_jsonable(program_row(_pick(d.channel_ids, i), BULK_SLOTS + i * 20 + n, "Bulk")) for n in range(20)],
+             "headers": admin(d)},
+        )),
+        Scenario("POST /programs/bulk/xmltv", lambda d, i: (
+            "POST", "/programs/bulk/xmltv",
+            {"files": {"file": ("schedule.xml", _xmltv_document(_pick(d.channel_ids, i), i))}, "headers": admin(d)},
+        )),
+    ]
+
+def _jsonable(row: dict) -> dict:
+    return {key: _iso(value) if isinstance(value, datetime) else value for key, value in row.items()}
+
+# --- Запуск і статистика ---
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """Перцентиль методом найближчого рангу."""
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, int(round(q / 100 * len(sorted_samples) + 0.5)) - 1))
+    return sorted_samples[index]
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    samples = sorted(latencies)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3) if samples else 0.0,
+    }
+
+async def run_scenario(client, scenario: Scenario, dataset: Dataset, requests: int, concurrency: int) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for i in counter:
+            method, url, kwargs = scenario.build(dataset, i)
+            started = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+async def run_login_storm(client, dataset: Dataset, requests: int, concurrency: int) -> dict:
+    """Затримка звичайного GET під час шквалу логінів (перевірка, що bcrypt не блокує event loop)."""
+    probe = next(s for s in build_scenarios() if s.name == "GET /schedule/now")
+    login = next(s for s in build_scenarios() if s.name == "POST /auth/token")
+    baseline = await run_scenario(client, probe, dataset, requests, 1)
+    storm = asyncio.ensure_future(run_scenario(client, login, dataset, requests, concurrency))
+    during = await run_scenario(client, probe, dataset, requests, 1)
+    logins = await storm
+    return {"get_baseline": baseline, "get_during_logins": during, "logins": logins}
+
+async def login(client, username: str) -> str:
+    response = await client.post("/auth/token", data={"username": username, "password": BENCH_PASSWORD})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+async def run_benchmark(args) -> dict:
+    import httpx
+    import main
+
+    await connect(args.backend)
+    generation_started = time.perf_counter()
+    dataset = await generate_dataset(args.channels, args.programs, args.users, deletable=args.requests)
+    generation_seconds = time.perf_counter() - generation_started
+
+    # Помилки застосунку рахуються як відповіді 500, а не обривають бенчмарк
+    transport = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        dataset.admin_token = await login(client, dataset.usernames[0])
+        dataset.user_token = await login(client, _pick(dataset.usernames, 1))
+
+        results = {}
+        for scenario in build_scenarios():
+            if args.only and scenario.name not in args.only:
+                continue
+            results[scenario.name] = await run_scenario(client, scenario, dataset, args.requests, args.concurrency)
+            print(f"{scenario.name:<32} {json.dumps(results[scenario.name])}", file=sys.stderr)
+        if args.login_storm:
+            results["login storm"] = await run_login_storm(client, dataset, args.requests, args.concurrency)
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "backend": args.backend,
+        "config": {
+            "channels": args.channels,
+            "programs_per_channel": args.programs,
+            "users": args.users,
+            "requests_per_endpoint": args.requests,
+            "concurrency": args.concurrency,
+        },
+        "dataset_generation_seconds": round(generation_seconds, 3),
+        "endpoints": results,
+    }
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Навантажувальний бенчмарк API телепрограми")
+    parser.add_argument("--backend", choices=["mongod", "uri", "inprocess"], default="mongod",
+                        help="mongod - тимчасовий локальний mongod, uri - існуюча база, inprocess - mongomock")
+    parser.add_argument("--mongo-uri", default=os.getenv("BENCH_MONGODB_URI", "mongodb://127.0.0.1:27017"))
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--programs", type=int, default=200, help="Кількість програм на канал")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200, help="Кількість запитів на кожен маршрут")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--only", action="append", help="Запустити лише вказані сценарії (можна повторювати)")
+    parser.add_argument("--login-storm", action="store_true", help="Додатково виміряти GET під час шквалу логінів")
+    parser.add_argument("--output", help="Файл для JSON-звіту (за замовчуванням stdout)")
+    return parser.parse_args()
+
+def main() -> None:
+    args = parse_args()
+    mongod = None
+    if args.backend == "mongod":
+        mongod = LocalMongod()
+        mongod.start()
+        configure_environment(mongod.uri)
+    else:
+        configure_environment(args.mongo_uri)
+    try:
+        # Службові print застосунку йдуть у stderr, щоб не змішуватися з JSON-звітом
+        with contextlib.redirect_stdout(sys.stderr):
+            report = asyncio.run(run_benchmark(args))
+    finally:
+        if mongod is not None:
+            mongod.stop()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Бенчмарк пакетної перевірки перетинів програм (overlap.validate_channel_batch).
+
+Генерує розклад із наявними програмами в базі (щільна сітка по 30 хвилин) і пакет нових програм,
+частина з яких перетинається з базою або між собою, і вимірює лише перевірку в пам'яті:
+побудову індексів проміжків та рішення для кожного рядка. Запити до Mongo (один на канал пачки)
+сюди не входять - їх показує benchmarks/load.py.
+
+Запуск: python benchmarks/overlap.py [кількість нових програм] [кількість каналів] [політика]
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from overlap import OVERLAP_POLICIES, ChannelIntervalIndex, validate_channel_batch
+
+SLOT = timedelta(minutes=30)
+
+def make_channel(channel: int, count: int, rng: random.Random):
+    """Наявні програми каналу (кожен другий слот) і нові програми, ~10% з яких зсунуті на чверть слоту."""
+    base = datetime(2024, 1, 1)
+    existing = [(base + SLOT * (2 * i), base + SLOT * (2 * i + 1), (channel, i)) for i in range(count)]
+    rows = []
+    for i in range(count):
+        start = base + SLOT * (2 * i + 1)
+        if rng.random() < 0.1:
+            start += SLOT / 4
+        rows.append((channel * count + i, start, start + SLOT))
+    rng.shuffle(rows)
+    return existing, rows
+
+def run(count: int, channels: int, policy: str) -> None:
+    rng = random.Random(42)
+    per_channel = max(1, count // channels)
+    data = [make_channel(channel, per_channel, rng) for channel in range(channels)]
+
+    started = time.perf_counter()
+    accepted = trimmed = 0
+    for existing, rows in data:
+        decisions = validate_channel_batch(rows, ChannelIntervalIndex(existing), policy)
+        accepted += sum(decision.accepted for decision in decisions.values())
+        trimmed += sum(decision.trimmed for decision in decisions.values())
+    elapsed = time.perf_counter() - started
+
+    total = per_channel * channels
+    print(f"{total} нових програм проти {total} наявних, {channels} каналів, політика {policy}")
+    print(f"прийнято {accepted}, обрізано {trimmed}, відхилено {total - accepted}")
+    print(f"{elapsed * 1000:.1f} ms ({total / elapsed:,.0f} рядків/с)")
+
+if __name__ == "__main__":
+    policy = sys.argv[3] if len(sys.argv) > 3 else "reject"
+    if policy not in OVERLAP_POLICIES:
+        sys.exit(f"Політика має бути однією з {OVERLAP_POLICIES}")
+    run(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 100_000,
+        channels=int(sys.argv[2]) if len(sys.argv) > 2 else 50,
+        policy=policy,
+    )
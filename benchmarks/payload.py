@@ -0,0 +1,58 @@
+"""
+Бенчмарк розміру та часу підготовки відповіді для великого розкладу.
+
+Порівнює повні програми з вибраними полями (fields=id,title,start_time,channel.name)
+і кожен варіант без стиснення, з gzip та brotli (якщо встановлено пакет brotli).
+Вимірює лише серіалізацію та стиснення; вплив проєкції на читання з Mongo
+показує benchmarks/load.py (наприклад, порівняння GET /programs/ з fields і без).
+
+Запуск: python benchmarks/payload.py [кількість програм] [повтори]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("DATABASE_NAME", "benchmark")
+
+import compression
+import crud
+from routes import PROGRAM_RESPONSE_FIELDS, encode_json, parse_fields, select_fields
+from serialization import _Channel, make_documents
+
+MOBILE_FIELDS = "id,title,start_time,channel.name"
+
+def run(count: int, repeats: int) -> None:
+    channel = _Channel()
+    channels_by_id = {channel.id: channel}
+    documents = make_documents(count, channel)
+    selections = {"full": None, "mobile": parse_fields(MOBILE_FIELDS, PROGRAM_RESPONSE_FIELDS)}
+    encodings = [None, "gzip"] + (["br"] if compression.brotli is not None else [])
+
+    print(f"{count} програм, середнє з {repeats} повторів")
+    for name, selection in selections.items():
+        for encoding in encodings:
+            def respond() -> bytes:
+                body = encode_json({"items": [
+                    select_fields(crud.program_document_to_dict(document, channels_by_id), selection)
+                    for document in documents
+                ]})
+                if encoding is None:
+                    return body
+                compressor = compression._Compressor(encoding)
+                return compressor.compress(body) + compressor.finish()
+
+            size = len(respond()) # прогрів
+            started = time.perf_counter()
+            for _ in range(repeats):
+                respond()
+            elapsed = (time.perf_counter() - started) / repeats
+            print(f"{name:>7} {encoding or 'identity':>9}: {size / 1024:9.1f} KiB, {elapsed * 1000:8.2f} ms")
+
+if __name__ == "__main__":
+    run(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+        repeats=int(sys.argv[2]) if len(sys.argv) > 2 else 10,
+    )
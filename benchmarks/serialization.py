@@ -0,0 +1,75 @@
+"""
+Мікробенчмарк серіалізації списку програм.
+
+Порівнює шлях через Pydantic (валідація за response_model + model_dump_json, як це робить FastAPI)
+зі швидким шляхом читання (словник з "сирого" документа + encode_json).
+
+Запуск: python benchmarks/serialization.py [кількість програм] [повтори]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark")
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("DATABASE_NAME", "benchmark")
+
+from bson import DBRef, ObjectId
+from pydantic import TypeAdapter
+
+import crud
+import schemas
+from routes import encode_json
+
+class _Channel:
+    def __init__(self):
+        self.id = ObjectId()
+        self.name = "Benchmark Channel"
+        self.country = "UA"
+
+def make_documents(count: int, channel: _Channel) -> List[dict]:
+    """Генерує "сирі" документи програм у тому вигляді, в якому їх повертає Motor."""
+    start = datetime(2024, 1, 1)
+    return [
+        {
+            "_id": ObjectId(),
+            "title": f"Program {i}",
+            "description": "Synthetic description " * 5,
+            "start_time": start + timedelta(minutes=30 * i),
+            "end_time": start + timedelta(minutes=30 * (i + 1)),
+            "channel": DBRef("channels", channel.id),
+            "tags": ["news", "live"],
+            "revision": 0,
+        }
+        for i in range(count)
+    ]
+
+def run(count: int, repeats: int) -> None:
+    channel = _Channel()
+    channels_by_id = {channel.id: channel}
+    documents = make_documents(count, channel)
+    adapter = TypeAdapter(List[schemas.TVProgramResponse])
+
+    def pydantic_path() -> bytes:
+        data = [crud.program_document_to_dict(document, channels_by_id) for document in documents]
+        return adapter.dump_json(adapter.validate_python(data))
+
+    def lean_path() -> bytes:
+        return encode_json([crud.program_document_to_dict(document, channels_by_id) for document in documents])
+
+    for name, func in (("pydantic", pydantic_path), ("lean", lean_path)):
+        func() # прогрів
+        started = time.perf_counter()
+        for _ in range(repeats):
+            func()
+        elapsed = time.perf_counter() - started
+        print(f"{name:>8}: {elapsed / repeats * 1000:8.2f} ms на {count} програм, {count * repeats / elapsed:10.0f} програм/с")
+
+if __name__ == "__main__":
+    run(
+        count=int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+        repeats=int(sys.argv[2]) if len(sys.argv) > 2 else 20,
+    )
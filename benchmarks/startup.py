@@ -0,0 +1,68 @@
+"""
+Бенчмарк холодного старту воркера.
+
+Запускає `uvicorn main:app` окремим процесом у звичайному та швидкому (FAST_START=1) режимах
+і вимірює час від запуску процесу до першої успішної відповіді /health/live.
+Потрібна доступна MongoDB (MONGODB_URI та DATABASE_NAME з .env або оточення).
+
+Запуск: python benchmarks/startup.py [кількість запусків на режим]
+"""
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STARTUP_TIMEOUT_SECONDS = 60
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def time_to_first_request(fast_start: bool) -> float:
+    """Секунди від запуску uvicorn до першої відповіді 200 на /health/live."""
+    port = _free_port()
+    env = {**os.environ, "FAST_START": "1" if fast_start else "0"}
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < STARTUP_TIMEOUT_SECONDS:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn завершився з кодом {process.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health/live", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("Воркер не відповів за відведений час")
+    finally:
+        process.terminate()
+        process.wait()
+
+def main() -> None:
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    report = {}
+    for mode, fast_start in (("default", False), ("fast_start", True)):
+        samples = [time_to_first_request(fast_start) for _ in range(runs)]
+        report[mode] = {
+            "runs": runs,
+            "median_ms": round(statistics.median(samples) * 1000, 1),
+            "min_ms": round(min(samples) * 1000, 1),
+            "max_ms": round(max(samples) * 1000, 1),
+        }
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
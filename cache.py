@@ -0,0 +1,314 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Iterable, List, NamedTuple, Optional, Set, Tuple, TypeVar
+
+from beanie import PydanticObjectId
+from models import TVChannel, User
+
+# --- Налаштування ---
+CHANNEL_CACHE_TTL_SECONDS = float(os.getenv("CHANNEL_CACHE_TTL_SECONDS", 300))
+# Як часто можна перезавантажувати каталог через запит невідомого каналу
+CHANNEL_CACHE_MISS_RELOAD_SECONDS = float(os.getenv("CHANNEL_CACHE_MISS_RELOAD_SECONDS", 5))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 1024))
+# Версії колекцій локальні для процесу, тому TTL обмежує застарілість між воркерами
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", 10))
+AUTH_CACHE_TTL_SECONDS = float(os.getenv("AUTH_CACHE_TTL_SECONDS", 30))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10000))
+
+# --- Каталог каналів ---
+class ChannelCatalog:
+    """
+    Кеш усіх каналів у пам'яті процесу.
+    Каналів мало і вони майже не змінюються, тому каталог завантажується цілком
+    одним запитом, оновлюється за TTL і скидається одразу після запису каналу.
+    """
+
+    def __init__(self, ttl_seconds: float, miss_reload_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.miss_reload_seconds = miss_reload_seconds
+        self._channels: Dict[PydanticObjectId, TVChannel] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _age(self) -> Optional[float]:
+        if self._loaded_at is None:
+            return None
+        return time.monotonic() - self._loaded_at
+
+    def _is_fresh(self) -> bool:
+        age = self._age()
+        return age is not None and age < self.ttl_seconds
+
+    async def load(self) -> None:
+        """Завантажує всі канали з бази."""
+        channels = await TVChannel.find_all().to_list()
+        self._channels = {channel.id: channel for channel in channels}
+        self._loaded_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Скидає каталог - наступне звернення перезавантажить його з бази."""
+        self._loaded_at = None
+
+    async def _ensure_fresh(self) -> bool:
+        """Перезавантажує каталог, якщо він застарів. Повертає True, якщо бази не чіпали."""
+        if self._is_fresh():
+            return True
+        async with self._lock:
+            # Поки чекали на блокування, каталог міг завантажити інший запит
+            if self._is_fresh():
+                return True
+            await self.load()
+            return False
+
+    def _count(self, served_from_memory: bool) -> None:
+        if served_from_memory:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    async def all(self) -> List[TVChannel]:
+        """Повертає всі канали."""
+        self._count(await self._ensure_fresh())
+        return list(self._channels.values())
+
+    async def get_many(self, channel_ids: Iterable[PydanticObjectId]) -> Dict[PydanticObjectId, TVChannel]:
+        """Повертає знайдені канали за списком ID (відсутні ID пропускаються)."""
+        channel_ids = set(channel_ids)
+        served_from_memory = await self._ensure_fresh()
+
+        # Невідомий канал міг щойно створити інший воркер - перезавантажуємо, але не частіше за ліміт
+        if served_from_memory and not channel_ids.issubset(self._channels):
+            if self._age() >= self.miss_reload_seconds:
+                async with self._lock:
+                    await self.load()
+                served_from_memory = False
+
+        self._count(served_from_memory)
+        return {channel_id: self._channels[channel_id] for channel_id in channel_ids if channel_id in self._channels}
+
+    async def get(self, channel_id: PydanticObjectId) -> Optional[TVChannel]:
+        """Повертає канал за ID або None, якщо такого каналу немає."""
+        return (await self.get_many([channel_id])).get(channel_id)
+
+    def stats(self) -> dict:
+        """Лічильники звернень до каталогу."""
+        age = self._age()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._channels),
+            "ttl_seconds": self.ttl_seconds,
+            "age_seconds": round(age, 3) if age is not None else None,
+        }
+
+channel_catalog = ChannelCatalog(
+    ttl_seconds=CHANNEL_CACHE_TTL_SECONDS,
+    miss_reload_seconds=CHANNEL_CACHE_MISS_RELOAD_SECONDS,
+)
+
+# --- Версії колекцій ---
+# Лічильник змін для кожної колекції: crud збільшує його після кожного запису,
+# і всі закешовані відповіді, що залежать від колекції, стають недійсними.
+collection_versions: Dict[str, int] = {"programs": 0, "channels": 0}
+
+def bump_version(*collections: str) -> None:
+    """Позначає колекції як змінені."""
+    for collection in collections:
+        collection_versions[collection] = collection_versions.get(collection, 0) + 1
+
+def current_versions(collections: Iterable[str]) -> Tuple[int, ...]:
+    """Повертає поточні версії колекцій у заданому порядку."""
+    return tuple(collection_versions.get(collection, 0) for collection in collections)
+
+# --- Кеш відповідей ---
+def response_etag(body: bytes, prefix: str = "") -> str:
+    """ETag відповіді: префікс (наприклад, ревізія програми) і хеш тіла."""
+    return '"' + prefix + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    versions: Tuple[int, ...]
+    created_at: float
+
+class ResponseCache:
+    """
+    LRU-кеш серіалізованих відповідей разом з сильним ETag.
+    Запис дійсний, доки не змінилися версії колекцій, з яких його побудовано, і не минув TTL.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, versions: Tuple[int, ...]) -> Optional[CachedResponse]:
+        """Повертає дійсний запис або None."""
+        entry = self._entries.get(key)
+        if entry is not None and (
+            entry.versions != versions or time.monotonic() - entry.created_at >= self.ttl_seconds
+        ):
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, body: bytes, versions: Tuple[int, ...], etag_prefix: str = "") -> CachedResponse:
+        """Зберігає відповідь, витісняючи найдавніше використані записи понад ліміт."""
+        entry = CachedResponse(body=body, etag=response_etag(body, etag_prefix), versions=versions, created_at=time.monotonic())
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+response_cache = ResponseCache(max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl_seconds=RESPONSE_CACHE_TTL_SECONDS)
+
+# --- Об'єднання однакових паралельних запитів ---
+T = TypeVar("T")
+
+class SingleFlight:
+    """
+    Однакові обчислення, що йдуть одночасно, виконуються один раз: перший запит запускає
+    спільну задачу, решта чекають на її результат (або виняток).
+    Задача захищена asyncio.shield - скасування одного з клієнтів не зупиняє її для інших.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.followers = 0
+        self.failures = 0
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Забираємо виняток, навіть якщо всі клієнти вже відключилися (інакше asyncio попереджає в лог)
+        if not task.cancelled() and task.exception() is not None:
+            self.failures += 1
+
+    async def do(self, key: Hashable, produce: Callable[[], Awaitable[T]]) -> T:
+        """Повертає результат produce(), об'єднуючи паралельні виклики з однаковим ключем."""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(produce())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+            self.leaders += 1
+        else:
+            self.followers += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        total = self.leaders + self.followers
+        return {
+            "leaders": self.leaders,
+            "followers": self.followers,
+            "failures": self.failures,
+            "in_flight": len(self._in_flight),
+            # Частка запитів, які не пішли в базу, а дочекалися чужого результату
+            "coalescing_ratio": round(self.followers / total, 4) if total else 0.0,
+        }
+
+response_flights = SingleFlight()
+
+# --- Кеш автентифікованих користувачів ---
+class CachedPrincipal(NamedTuple):
+    user: User
+    expires_at: float
+
+class PrincipalCache:
+    """
+    LRU-кеш "токен -> користувач" з коротким TTL.
+    Дозволяє не декодувати JWT і не ходити в Mongo на кожен захищений запит.
+    Запис живе не довше за сам токен і скидається при зміні користувача.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CachedPrincipal]" = OrderedDict()
+        self._tokens_by_username: Dict[str, Set[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _remove(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens_by_username.get(entry.user.username)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_username[entry.user.username]
+
+    def get(self, token: str) -> Optional[User]:
+        """Повертає користувача для токена або None, якщо запису немає чи він застарів."""
+        entry = self._entries.get(token)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._remove(token)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return entry.user
+
+    def put(self, token: str, user: User, token_expires_at: Optional[float] = None) -> None:
+        """
+        Зберігає користувача для токена.
+        token_expires_at - час завершення дії токена (exp, секунди Unix).
+        """
+        ttl = self.ttl_seconds
+        if token_expires_at is not None:
+            ttl = min(ttl, token_expires_at - time.time())
+        if ttl <= 0:
+            return
+        self._remove(token)
+        self._entries[token] = CachedPrincipal(user=user, expires_at=time.monotonic() + ttl)
+        self._tokens_by_username.setdefault(user.username, set()).add(token)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, username: str) -> None:
+        """Скидає всі записи користувача (після зміни його ролі чи даних)."""
+        for token in list(self._tokens_by_username.get(username, ())):
+            self._remove(token)
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+principal_cache = PrincipalCache(max_entries=AUTH_CACHE_MAX_ENTRIES, ttl_seconds=AUTH_CACHE_TTL_SECONDS)
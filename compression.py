@@ -0,0 +1,174 @@
+import os
+import zlib
+from typing import List, Optional, Tuple
+
+try:
+    import brotli # Необов'язкова залежність: краще стиснення JSON, ніж gzip
+except ImportError:
+    brotli = None
+
+# --- Налаштування ---
+# Менші відповіді не стискаються: виграш у байтах не вартий часу процесора
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))
+
+# Типи, які стискати немає сенсу або не можна (SSE має доходити до клієнта без буферизації)
+SKIPPED_CONTENT_TYPES = ("text/event-stream", "image/", "video/", "audio/", "application/zip", "application/gzip")
+
+def parse_accept_encoding(header: str) -> dict:
+    """Розбирає Accept-Encoding у словник "кодування -> q"."""
+    encodings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[name.strip().lower()] = quality
+    return encodings
+
+def choose_encoding(header: str) -> Optional[str]:
+    """Вибирає кодування відповіді: brotli (якщо встановлено), інакше gzip, або None."""
+    encodings = parse_accept_encoding(header)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best, best_quality = None, 0.0
+    for encoding in candidates:
+        quality = encodings.get(encoding, encodings.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+class _Compressor:
+    """Потоковий компресор з однаковим інтерфейсом для gzip та brotli."""
+
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        """Стискає шматок і одразу віддає все, що можна (щоб потокові відповіді не затримувалися)."""
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+def _header(headers: List[Tuple[bytes, bytes]], name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+class CompressionMiddleware:
+    """
+    Чистий ASGI middleware: стискає відповіді gzip або brotli за заголовком Accept-Encoding.
+    Пропускає малі відповіді (менші за minimum_size), уже стиснуті (є Content-Encoding),
+    SSE та бінарні типи. Потокові відповіді стискаються шматками, без буферизації.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = dict(scope.get("headers", []))
+        encoding = choose_encoding(request_headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor: Optional[_Compressor] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor, passthrough
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", [])
+                content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+                passthrough = (
+                    message["status"] in (204, 304)
+                    or _header(headers, b"content-encoding") is not None
+                    or content_type.startswith(SKIPPED_CONTENT_TYPES)
+                )
+                if passthrough:
+                    await send(message)
+                else:
+                    # Рішення приймаємо після першого шматка тіла - тоді відомий його розмір
+                    start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start_message is not None:
+                start = start_message
+                start_message = None
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                if not more_body:
+                    # Тіло відповіді цілком - стискаємо одразу і передаємо точну довжину
+                    data = compressor.compress(body) + compressor.finish()
+                    headers = self._compressed_headers(start.get("headers", []), encoding, content_length=len(data))
+                    await send({**start, "headers": headers})
+                    await send({"type": "http.response.body", "body": data, "more_body": False})
+                    return
+                await send({**start, "headers": self._compressed_headers(start.get("headers", []), encoding)})
+
+            data = compressor.compress(body) if body else b""
+            if not more_body:
+                data += compressor.finish()
+            if data or not more_body:
+                await send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _compressed_headers(
+        headers: List[Tuple[bytes, bytes]],
+        encoding: str,
+        content_length: Optional[int] = None,
+    ) -> List[Tuple[bytes, bytes]]:
+        result = []
+        vary = None
+        for key, value in headers:
+            name = key.lower()
+            if name == b"content-length":
+                continue # Довжина зміниться після стиснення
+            if name == b"etag" and not value.startswith(b"W/"):
+                # Стиснуте представлення не побайтово ідентичне - сильний ETag стає слабким
+                value = b"W/" + value
+            if name == b"vary":
+                vary = value
+                continue
+            result.append((key, value))
+        vary_values = [v.strip() for v in vary.split(b",")] if vary else []
+        if b"accept-encoding" not in (v.lower() for v in vary_values):
+            vary_values.append(b"Accept-Encoding")
+        result.append((b"vary", b", ".join(vary_values)))
+        result.append((b"content-encoding", encoding.encode()))
+        if content_length is not None:
+            # Для потокової відповіді довжина наперед невідома - тіло йде частинами
+            result.append((b"content-length", str(content_length).encode()))
+        return result
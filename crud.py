@@ -1,11 +1,268 @@
-from typing import List, Optional
-from beanie import PydanticObjectId 
-from models import TVProgram, TVChannel, User
-from schemas import TVProgramCreate, UserCreate 
-from security import hash_password
+import base64
+import json
+import asyncio
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, List, Optional, Set, Tuple, Union
+from beanie import PydanticObjectId, Link
+from pydantic import ValidationError
+from bson import DBRef
+from pymongo import ASCENDING, DeleteOne, ReplaceOne, ReturnDocument, UpdateMany
+from pymongo.errors import BulkWriteError
+from models import ArchivedTVProgram, ChannelDay, ChannelSnapshot, TVProgram, TVChannel, User
+from schemas import TVProgramCreate, TVProgramUpdate, TVChannelCreate, UserCreate 
+from security import hash_password_async
+from cache import channel_catalog, bump_version, principal_cache
+from overlap import (
+    OVERLAP_MAX_REPORTED_CONFLICTS, OVERLAP_POLICIES, OVERLAP_REJECT, OVERLAP_TRIM, OVERLAP_WARN,
+    ChannelIntervalIndex, OverlapDecision, trim_interval, validate_channel_batch,
+)
 
 # --- TVProgram CRUD ---
 
+# Налаштування пагінації та потокової видачі списку програм
+PROGRAM_PAGE_DEFAULT_LIMIT = 100
+PROGRAM_PAGE_MAX_LIMIT = 1000
+PROGRAM_STREAM_BATCH_SIZE = 500
+
+# Розмір пачки для масового імпорту програм (insert_many)
+PROGRAM_BULK_BATCH_SIZE = int(os.getenv("PROGRAM_BULK_BATCH_SIZE", 1000))
+# Скільки помилок по рядках повертати у звіті імпорту
+PROGRAM_BULK_MAX_REPORTED_ERRORS = 1000
+
+# Денормалізація: програми зберігають копію каналу (channel_snapshot) і читаються без join
+PROGRAM_CHANNEL_SNAPSHOTS = os.getenv("PROGRAM_CHANNEL_SNAPSHOTS", "0").lower() in ("1", "true", "yes")
+
+# Що робити з програмою, яка перетинається з іншими програмами каналу: reject, warn або trim
+PROGRAM_OVERLAP_POLICY = os.getenv("PROGRAM_OVERLAP_POLICY", OVERLAP_REJECT).lower()
+if PROGRAM_OVERLAP_POLICY not in OVERLAP_POLICIES:
+    raise ValueError(f"PROGRAM_OVERLAP_POLICY має бути одним із {OVERLAP_POLICIES}, отримано: {PROGRAM_OVERLAP_POLICY}")
+# Скільки перетинів читати для однієї програми (для trim потрібні всі, тож з запасом)
+PROGRAM_OVERLAP_QUERY_LIMIT = 50
+
+# Архівація: програми, що закінчилися понад PROGRAM_ARCHIVE_AFTER_DAYS днів тому, переносяться в programs_archive.
+# Пачки по PROGRAM_ARCHIVE_BATCH_SIZE з паузою між ними, щоб не створювати пікового навантаження на запис
+PROGRAM_ARCHIVE_AFTER_DAYS = int(os.getenv("PROGRAM_ARCHIVE_AFTER_DAYS", 90))
+PROGRAM_ARCHIVE_BATCH_SIZE = int(os.getenv("PROGRAM_ARCHIVE_BATCH_SIZE", 500))
+PROGRAM_ARCHIVE_PAUSE_SECONDS = float(os.getenv("PROGRAM_ARCHIVE_PAUSE_SECONDS", 0.5))
+
+# Експорт розкладу: розмір пачки курсора
+PROGRAM_EXPORT_BATCH_SIZE = int(os.getenv("PROGRAM_EXPORT_BATCH_SIZE", 1000))
+# Поля програми, які читаються з бази на швидкому шляху читання (без гідратації в TVProgram)
+PROGRAM_PROJECTION = {
+    "title": 1, "description": 1, "start_time": 1, "end_time": 1, "channel": 1, "tags": 1, "revision": 1,
+    "channel_snapshot": 1,
+}
+
+# Поля відповіді програми, які можна вибрати параметром fields=, і поля документа, що для них читаються
+PROGRAM_FIELD_SOURCES = {
+    "id": (),
+    "title": ("title",),
+    "description": ("description",),
+    "start_time": ("start_time",),
+    "end_time": ("end_time",),
+    "tags": ("tags",),
+    "revision": ("revision",),
+    "channel": ("channel", "channel_snapshot"),
+}
+CHANNEL_FIELDS = ("id", "name", "country")
+
+# Пошук програм
+PROGRAM_SEARCH_MAX_LIMIT = 100
+PROGRAM_SEARCH_TAG_FACETS = 50
+
+# Порядок сортування для keyset-пагінації (покривається індексом start_time_id_asc_index)
+PROGRAM_KEYSET_SORT = [("start_time", ASCENDING), ("_id", ASCENDING)]
+
+def program_projection(fields: Optional[Iterable[str]] = None) -> dict:
+    """
+    Проєкція Mongo для вибраних полів відповіді програми (None - усі поля).
+    start_time читається завжди: за ним сортуються сторінки і будується курсор.
+    """
+    if fields is None:
+        return PROGRAM_PROJECTION
+    projection = {"start_time": 1}
+    for field in fields:
+        for source in PROGRAM_FIELD_SOURCES[field]:
+            projection[source] = 1
+    return projection
+
+def channel_snapshot(channel: TVChannel) -> Optional[ChannelSnapshot]:
+    """Знімок каналу для збереження в програмі (None, якщо денормалізацію вимкнено)."""
+    if not PROGRAM_CHANNEL_SNAPSHOTS:
+        return None
+    return ChannelSnapshot(id=channel.id, name=channel.name, country=channel.country)
+
+def _uses_snapshot(document: dict) -> bool:
+    return PROGRAM_CHANNEL_SNAPSHOTS and document.get("channel_snapshot") is not None
+
+def program_document_to_dict(document: dict, channels_by_id: dict) -> dict:
+    """
+    Перетворює "сирий" документ програми з Mongo на словник у форматі TVProgramResponse.
+    Канал береться зі знімка в документі (якщо денормалізацію увімкнено) або з переданого
+    словника (каталог каналів), без додаткових запитів.
+    """
+    if _uses_snapshot(document):
+        snapshot = document["channel_snapshot"]
+        channel = ChannelSnapshot(id=snapshot["id"], name=snapshot["name"], country=snapshot["country"])
+    else:
+        channel = channels_by_id.get(getattr(document.get("channel"), "id", None))
+    return {
+        "id": document["_id"],
+        "title": document.get("title"),
+        "description": document.get("description"),
+        "start_time": document.get("start_time"),
+        "end_time": document.get("end_time"),
+        "tags": document.get("tags"),
+        "revision": document.get("revision", 0),
+        "channel": {"id": channel.id, "name": channel.name, "country": channel.country} if channel else None,
+    }
+
+async def program_documents_to_dicts(documents: List[dict]) -> List[dict]:
+    """Перетворює "сирі" документи програм на словники відповіді, беручи канали з каталогу."""
+    channels_by_id = await channel_catalog.get_many(
+        {
+            document["channel"].id for document in documents
+            if document.get("channel") is not None and not _uses_snapshot(document)
+        }
+    )
+    return [program_document_to_dict(document, channels_by_id) for document in documents]
+
+def program_channel_id(program: TVProgram) -> Optional[PydanticObjectId]:
+    """Повертає ID каналу програми - і для незавантаженого посилання, і для документа."""
+    if isinstance(program.channel, Link):
+        return program.channel.ref.id
+    return program.channel.id if program.channel else None
+
+async def resolve_program_channels(programs: List[TVProgram]) -> List[TVProgram]:
+    """
+    Підтягує канали для списку програм з каталогу каналів (один запит на весь список,
+    і то лише коли каталог застарів) замість окремого fetch_link для кожної програми.
+    """
+    channel_ids = {
+        program.channel.ref.id for program in programs if isinstance(program.channel, Link)
+    }
+    if not channel_ids:
+        return programs
+
+    channels_by_id = await channel_catalog.get_many(channel_ids)
+
+    # Підставляємо завантажені канали замість посилань
+    for program in programs:
+        if isinstance(program.channel, Link):
+            channel = channels_by_id.get(program.channel.ref.id)
+            if channel is not None:
+                program.channel = channel
+    return programs
+
+# --- Перетини програм у розкладі каналу ---
+
+class InvalidProgramTimesError(Exception):
+    """Кінець програми не пізніше за її початок."""
+
+class ScheduleOverlapError(Exception):
+    """Програма перетинається з іншими програмами каналу (політика reject або обрізати не вдалося)."""
+
+    def __init__(self, conflicts: List[dict]):
+        super().__init__("Program overlaps other programs of the channel")
+        self.conflicts = conflicts # Документи конфліктних програм: _id, title, start_time, end_time
+
+async def find_overlapping_programs(
+    channel_id: PydanticObjectId,
+    start_time: datetime,
+    end_time: datetime,
+    exclude_id: Optional[PydanticObjectId] = None,
+    limit: int = PROGRAM_OVERLAP_QUERY_LIMIT,
+) -> List[dict]:
+    """
+    Програми каналу, що перетинають [start_time, end_time), відсортовані за початком.
+    Запит за діапазоном покривається індексом channel_start_end_index (channel.$id, start_time, end_time).
+    """
+    query: dict = {
+        "channel.$id": channel_id,
+        "start_time": {"$lt": _as_naive_utc(end_time)},
+        "end_time": {"$gt": _as_naive_utc(start_time)},
+    }
+    if exclude_id is not None:
+        query["_id"] = {"$ne": exclude_id}
+    conflicts = []
+    for model in _program_models(reads_archive(start_time)):
+        cursor = model.get_motor_collection().find(query, {"title": 1, "start_time": 1, "end_time": 1})
+        conflicts += await cursor.sort("start_time", ASCENDING).limit(limit).to_list(limit)
+    return sorted(conflicts, key=lambda conflict: conflict["start_time"])[:limit]
+
+async def check_program_overlap(
+    channel_id: PydanticObjectId,
+    start_time: datetime,
+    end_time: datetime,
+    exclude_id: Optional[PydanticObjectId] = None,
+) -> Tuple[datetime, datetime]:
+    """
+    Перевіряє одну програму за політикою PROGRAM_OVERLAP_POLICY і повертає її (можливо, обрізані) час початку й кінця.
+    Викликає InvalidProgramTimesError або ScheduleOverlapError.
+    Перевірка не атомарна з записом: дві паралельні вставки в один проміжок можуть обидві пройти.
+    """
+    if _as_naive_utc(end_time) <= _as_naive_utc(start_time):
+        raise InvalidProgramTimesError()
+    conflicts = await find_overlapping_programs(channel_id, start_time, end_time, exclude_id)
+    if not conflicts:
+        return start_time, end_time
+    conflict_ids = ", ".join(str(conflict["_id"]) for conflict in conflicts[:OVERLAP_MAX_REPORTED_CONFLICTS])
+    if PROGRAM_OVERLAP_POLICY == OVERLAP_WARN:
+        print(f"Попередження: програма каналу {channel_id} перетинається з програмами {conflict_ids}")
+        return start_time, end_time
+    if PROGRAM_OVERLAP_POLICY == OVERLAP_TRIM:
+        trimmed = trim_interval(
+            _as_naive_utc(start_time), _as_naive_utc(end_time),
+            ((conflict["start_time"], conflict["end_time"]) for conflict in conflicts),
+        )
+        if trimmed is not None:
+            print(f"Попередження: програму каналу {channel_id} обрізано до {trimmed[0]} - {trimmed[1]} (перетин з {conflict_ids})")
+            return trimmed
+    raise ScheduleOverlapError(conflicts[:OVERLAP_MAX_REPORTED_CONFLICTS])
+
+async def _load_channel_interval_indexes(batch: List[Tuple[int, TVProgramCreate]]) -> dict:
+    """
+    Будує індекс проміжків для кожного каналу пачки: один запит на канал за вікном від найранішого
+    початку до найпізнішого кінця програм пачки.
+    """
+    windows: dict = {}
+    for _, data in batch:
+        channel_id = PydanticObjectId(data.channel_id)
+        start, end = _as_naive_utc(data.start_time), _as_naive_utc(data.end_time)
+        window = windows.get(channel_id)
+        windows[channel_id] = (min(window[0], start), max(window[1], end)) if window else (start, end)
+
+    async def load(channel_id: PydanticObjectId, window: Tuple[datetime, datetime]) -> ChannelIntervalIndex:
+        intervals = []
+        for model in _program_models(reads_archive(window[0])):
+            cursor = model.get_motor_collection().find(
+                {"channel.$id": channel_id, "start_time": {"$lt": window[1]}, "end_time": {"$gt": window[0]}},
+                {"start_time": 1, "end_time": 1},
+            )
+            intervals += [(document["start_time"], document["end_time"], document["_id"]) async for document in cursor]
+        return ChannelIntervalIndex(intervals)
+
+    indexes = await asyncio.gather(*(load(channel_id, window) for channel_id, window in windows.items()))
+    return dict(zip(windows, indexes))
+
+async def _check_batch_overlaps(batch: List[Tuple[int, TVProgramCreate]]) -> dict:
+    """Перевіряє пачку імпорту на перетини з програмами в базі та між собою. Повертає рішення за номером рядка."""
+    indexes = await _load_channel_interval_indexes(batch)
+    rows_by_channel: dict = {}
+    for row, data in batch:
+        rows_by_channel.setdefault(PydanticObjectId(data.channel_id), []).append(
+            (row, _as_naive_utc(data.start_time), _as_naive_utc(data.end_time))
+        )
+    decisions: dict = {}
+    for channel_id, rows in rows_by_channel.items():
+        decisions.update(validate_channel_batch(rows, indexes[channel_id], PROGRAM_OVERLAP_POLICY))
+    return decisions
+
+def _describe_conflicts(conflicts: list) -> str:
+    # Конфлікт - або ID програми з бази, або номер рядка цього ж імпорту
+    return ", ".join(f"row {conflict}" if isinstance(conflict, int) else f"program {conflict}" for conflict in conflicts)
+
 async def create_tv_program(program_data: TVProgramCreate) -> Optional[TVProgram]:
     """Створює нову програму в MongoDB."""
     # Перевіряємо, чи існує канал з таким channel_id
@@ -15,37 +272,262 @@ async def create_tv_program(program_data: TVProgramCreate) -> Optional[TVProgram
          print(f"Помилка: Невалідний формат channel_id: {program_data.channel_id}")
          return None 
 
-    channel = await TVChannel.get(channel_object_id) 
+    channel = await channel_catalog.get(channel_object_id) 
     if not channel:
         print(f"Помилка: Канал з ID {program_data.channel_id} не знайдений.")
         return None # Повертаємо None, якщо канал не знайдено
 
+    start_time, end_time = await check_program_overlap(channel.id, program_data.start_time, program_data.end_time)
     db_program = TVProgram(
         title=program_data.title,
         description=program_data.description,
-        start_time=program_data.start_time,
-        end_time=program_data.end_time,
+        start_time=start_time,
+        end_time=end_time,
         channel=channel, 
+        channel_snapshot=channel_snapshot(channel),
+        tags=program_data.tags,
     )
     # Вставляємо документ у базу даних
     await db_program.insert()
+    await _add_to_channel_days([(channel.id, _program_as_document(db_program))])
+    bump_version("programs")
     return db_program # Повертаємо створений документ
 
-async def get_tv_program(program_id: PydanticObjectId) -> Optional[TVProgram]:
-    """Отримує програму за її ID."""
-    program = await TVProgram.get(program_id)
-    if program and program.channel:
-         await program.fetch_link(TVProgram.channel) # Завантажуємо дані каналу
-    return program
+async def _insert_program_batch(
+    batch: List[Tuple[int, TVProgramCreate]],
+    ordered: bool,
+    report: dict,
+) -> bool:
+    """
+    Перевіряє канали пачки одним зверненням до каталогу, перетини - індексом проміжків
+    (один запит на канал), і вставляє пачку одним insert_many.
+    Повертає False, якщо впорядкований імпорт треба зупинити.
+    """
+    channels_by_id = await channel_catalog.get_many(
+        PydanticObjectId(data.channel_id) for _, data in batch
+    )
+    known = [(row, data) for row, data in batch if PydanticObjectId(data.channel_id) in channels_by_id]
+    unknown = {row for row, _ in batch} - {row for row, _ in known}
+    decisions = await _check_batch_overlaps(known) if known else {}
+    rejected = {row for row, decision in decisions.items() if not decision.accepted}
+    # Впорядкований імпорт вставляє лише рядки до першого помилкового (будь-якої причини) і зупиняється
+    stop_row = min(unknown | rejected) if ordered and (unknown or rejected) else None
 
-async def get_all_tv_programs() -> List[TVProgram]:
-    """Отримує всі програми."""
-    programs = await TVProgram.find_all().to_list()
-    # Завантажуємо пов'язані канали для кожної програми
-    for program in programs:
-        if program.channel:
-            await program.fetch_link(TVProgram.channel)
-    return programs
+    rows, documents = [], []
+    for row, data in batch:
+        if stop_row is not None and row > stop_row:
+            report["skipped"] += 1
+            continue
+        if row in unknown:
+            _report_bulk_error(report, row, f"Channel with id {data.channel_id} not found")
+            continue
+        decision: OverlapDecision = decisions[row]
+        if not decision.accepted:
+            _report_bulk_error(report, row, f"Overlaps {_describe_conflicts(decision.conflicts)}")
+            continue
+        if decision.trimmed:
+            _report_bulk_warning(report, row, f"Trimmed to {decision.start.isoformat()} - {decision.end.isoformat()} to avoid {_describe_conflicts(decision.conflicts)}")
+        elif decision.conflicts:
+            _report_bulk_warning(report, row, f"Overlaps {_describe_conflicts(decision.conflicts)}")
+        channel = channels_by_id[PydanticObjectId(data.channel_id)]
+        rows.append(row)
+        documents.append(TVProgram(
+            id=PydanticObjectId(), # ID відомі заздалегідь, щоб оновити доби каналів лише вставленими програмами
+            title=data.title,
+            description=data.description,
+            start_time=decision.start,
+            end_time=decision.end,
+            channel=channel,
+            channel_snapshot=channel_snapshot(channel),
+            tags=data.tags,
+        ))
+    if not documents:
+        return stop_row is None
+
+    failed_indexes: set = set()
+    try:
+        await TVProgram.insert_many(documents, ordered=ordered)
+        report["inserted"] += len(documents)
+    except BulkWriteError as e:
+        report["inserted"] += e.details.get("nInserted", 0)
+        for write_error in e.details.get("writeErrors", []):
+            failed_indexes.add(write_error["index"])
+            _report_bulk_error(report, rows[write_error["index"]], write_error.get("errmsg", "Write error"))
+        if ordered:
+            # Впорядкована вставка зупиняється на першій помилці - решту пачки не вставлено
+            first_failed = min(failed_indexes, default=len(documents))
+            report["skipped"] += len(documents) - first_failed - 1
+            failed_indexes.update(range(first_failed, len(documents)))
+
+    await _add_to_channel_days(
+        (program_channel_id(document), _program_as_document(document))
+        for index, document in enumerate(documents) if index not in failed_indexes
+    )
+    return not (ordered and (failed_indexes or stop_row is not None))
+
+def _report_bulk_error(report: dict, row: int, detail: str) -> None:
+    """Додає помилку рядка до звіту імпорту (список помилок обмежений за розміром)."""
+    report["failed"] += 1
+    if len(report["errors"]) < PROGRAM_BULK_MAX_REPORTED_ERRORS:
+        report["errors"].append({"row": row, "detail": detail})
+
+def _report_bulk_warning(report: dict, row: int, detail: str) -> None:
+    """Додає попередження для вставленого рядка (перетин за політикою warn або обрізання за trim)."""
+    if len(report["warnings"]) < PROGRAM_BULK_MAX_REPORTED_ERRORS:
+        report["warnings"].append({"row": row, "detail": detail})
+
+async def _iter_rows(rows: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    if isinstance(rows, AsyncIterable):
+        async for item in rows:
+            yield item
+    else:
+        for item in rows:
+            yield item
+
+async def bulk_create_tv_programs(
+    rows: Union[Iterable[Tuple[int, Any]], AsyncIterable[Tuple[int, Any]]],
+    batch_size: int = PROGRAM_BULK_BATCH_SIZE,
+    ordered: bool = False,
+) -> dict:
+    """
+    Масово імпортує програми з потоку рядків (номер рядка, дані програми або текст помилки розбору).
+    Рядки валідуються по одному, а пишуться пачками по batch_size через insert_many.
+    Перетини з іншими програмами каналу обробляються за PROGRAM_OVERLAP_POLICY.
+    У впорядкованому режимі (ordered) імпорт зупиняється на першому рядку з будь-якою помилкою.
+    Повертає звіт: скільки рядків отримано, вставлено, відхилено і не оброблено після зупинки
+    (received = inserted + failed + skipped), помилки і попередження по рядках.
+    """
+    report = {"received": 0, "inserted": 0, "failed": 0, "skipped": 0, "errors": [], "warnings": []}
+    batch: List[Tuple[int, TVProgramCreate]] = []
+    stopped = False
+    async for row, raw in _iter_rows(rows):
+        report["received"] += 1
+        if stopped:
+            # Впорядкований імпорт зупинено - решту рядків лише рахуємо
+            report["skipped"] += 1
+            continue
+
+        error = None
+        if isinstance(raw, str):
+            error = raw
+        elif not isinstance(raw, dict):
+            error = "Row must be a JSON object"
+        else:
+            try:
+                data = TVProgramCreate.model_validate(raw)
+                PydanticObjectId(data.channel_id)
+            except ValidationError as e:
+                details = e.errors()[0]
+                error = f"{'.'.join(str(loc) for loc in details['loc'])}: {details['msg']}"
+            except Exception:
+                error = f"Invalid channel_id: {raw.get('channel_id')}"
+        if error is not None:
+            _report_bulk_error(report, row, error)
+            if ordered:
+                # Рядки до помилкового ще вставляються, далі імпорт зупиняється
+                if batch:
+                    await _insert_program_batch(batch, ordered, report)
+                    batch = []
+                stopped = True
+            continue
+
+        batch.append((row, data))
+        if len(batch) >= batch_size:
+            stopped = not await _insert_program_batch(batch, ordered, report)
+            batch = []
+    if batch and not stopped:
+        await _insert_program_batch(batch, ordered, report)
+
+    if report["inserted"]:
+        bump_version("programs")
+    return report
+
+async def get_program_document(program_id: PydanticObjectId, projection: Optional[dict] = None) -> Optional[dict]:
+    """Отримує програму за ID одним запитом з проєкцією (у форматі TVProgramResponse)."""
+    document = await TVProgram.get_motor_collection().find_one({"_id": program_id}, projection or PROGRAM_PROJECTION)
+    if document is None:
+        return None
+    return (await program_documents_to_dicts([document]))[0]
+
+async def get_program_documents(
+    program_ids: List[PydanticObjectId],
+    projection: Optional[dict] = None,
+) -> Tuple[List[dict], List[PydanticObjectId]]:
+    """
+    Отримує програми за списком ID одним запитом $in (канали - з каталогу).
+    Повертає знайдені програми в порядку ID у списку (без повторів) та ID, яких немає в базі.
+    """
+    unique_ids = list(dict.fromkeys(program_ids))
+    documents = await TVProgram.get_motor_collection().find(
+        {"_id": {"$in": unique_ids}}, projection or PROGRAM_PROJECTION
+    ).to_list(length=len(unique_ids))
+    programs_by_id = {program["id"]: program for program in await program_documents_to_dicts(documents)}
+    found = [programs_by_id[program_id] for program_id in unique_ids if program_id in programs_by_id]
+    missing = [program_id for program_id in unique_ids if program_id not in programs_by_id]
+    return found, missing
+
+def encode_program_cursor(start_time: datetime, program_id: PydanticObjectId) -> str:
+    """Кодує позицію програми (start_time, _id) у непрозорий курсор."""
+    raw = json.dumps({"t": start_time.isoformat(), "id": str(program_id)})
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_program_cursor(cursor: str) -> Tuple[datetime, PydanticObjectId]:
+    """Розбирає курсор пагінації. Викликає ValueError, якщо курсор невалідний."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(raw["t"]), PydanticObjectId(raw["id"])
+    except Exception as e:
+        raise ValueError(f"Невалідний курсор: {cursor}") from e
+
+def _keyset_query(cursor: Optional[str]) -> dict:
+    """Будує умову "після курсора" для сортування за (start_time, _id)."""
+    if not cursor:
+        return {}
+    start_time, program_id = decode_program_cursor(cursor)
+    return {
+        "$or": [
+            {"start_time": {"$gt": start_time}},
+            {"start_time": start_time, "_id": {"$gt": program_id}},
+        ]
+    }
+
+async def get_tv_programs_page(
+    limit: int = PROGRAM_PAGE_DEFAULT_LIMIT,
+    cursor: Optional[str] = None,
+    projection: Optional[dict] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Отримує одну сторінку програм (keyset-пагінація за start_time та _id).
+    Повертає програми (у форматі TVProgramResponse) та курсор наступної сторінки
+    (None, якщо сторінка остання).
+    """
+    # Беремо на один документ більше, щоб знати, чи є наступна сторінка
+    documents = await TVProgram.get_motor_collection().find(
+        _keyset_query(cursor), projection or PROGRAM_PROJECTION
+    ).sort(PROGRAM_KEYSET_SORT).limit(limit + 1).to_list(length=limit + 1)
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_program_cursor(documents[-1]["start_time"], documents[-1]["_id"])
+    return await program_documents_to_dicts(documents), next_cursor
+
+async def iter_tv_programs(
+    cursor: Optional[str] = None,
+    batch_size: int = PROGRAM_STREAM_BATCH_SIZE,
+    projection: Optional[dict] = None,
+) -> AsyncIterator[List[dict]]:
+    """
+    Читає програми курсором Motor пачками по batch_size і віддає їх по одній пачці
+    (у форматі TVProgramResponse), щоб не тримати всю колекцію в пам'яті.
+    """
+    batch: List[dict] = []
+    async for document in iter_program_documents(_keyset_query(cursor), projection, batch_size=batch_size):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield await program_documents_to_dicts(batch)
+            batch = []
+    if batch:
+        yield await program_documents_to_dicts(batch)
 
 async def update_tv_program(program_id: PydanticObjectId, updated_data: TVProgramCreate) -> Optional[TVProgram]:
     """Оновлює існуючу програму."""
@@ -54,17 +536,18 @@ async def update_tv_program(program_id: PydanticObjectId, updated_data: TVProgra
         return None # Програма не знайдена
     
     if program.channel:
-        await program.fetch_link(TVProgram.channel)
+        await resolve_program_channels([program])
 
     # Перевіряємо, чи змінився channel_id і чи існує новий канал
     new_channel_id_str = str(updated_data.channel_id) # Конвертуємо в рядок для порівняння
-    current_channel_id_str = str(program.channel.id) if program.channel else None
+    current_channel_id = program_channel_id(program)
+    current_channel_id_str = str(current_channel_id) if current_channel_id else None
 
     new_channel = program.channel 
     if new_channel_id_str != current_channel_id_str:
         try:
             new_channel_object_id = PydanticObjectId(updated_data.channel_id)
-            new_channel = await TVChannel.get(new_channel_object_id)
+            new_channel = await channel_catalog.get(new_channel_object_id)
             if not new_channel:
                 print(f"Помилка оновлення: Новий канал з ID {updated_data.channel_id} не знайдений.")
                 return None # Новий канал не знайдено
@@ -75,45 +558,678 @@ async def update_tv_program(program_id: PydanticObjectId, updated_data: TVProgra
     update_dict = updated_data.model_dump(exclude_unset=True)
 
     # Оновлюємо поля програми
+    start_time, end_time = await check_program_overlap(
+        new_channel.id,
+        update_dict.get('start_time', program.start_time),
+        update_dict.get('end_time', program.end_time),
+        exclude_id=program.id,
+    )
+    placement = (current_channel_id, program.start_time, program.end_time) if current_channel_id else None
     program.title = update_dict.get('title', program.title)
     program.description = update_dict.get('description', program.description)
-    program.start_time = update_dict.get('start_time', program.start_time)
-    program.end_time = update_dict.get('end_time', program.end_time)
+    program.start_time = start_time
+    program.end_time = end_time
+    program.tags = update_dict.get('tags', program.tags)
+    program.revision += 1
     program.channel = new_channel # Оновлюємо посилання на канал
-    # Зберігаємо зміни
+    program.channel_snapshot = channel_snapshot(new_channel)
+    # Зберігаємо зміни (канал уже завантажений з каталогу, тож повторний fetch_link не потрібен)
     await program.save()
-    # Перезавантажуємо посилання на канал після збереження
-    await program.fetch_link(TVProgram.channel)
+    await _remove_from_channel_days(program.id, placement)
+    await _add_to_channel_days([(new_channel.id, _program_as_document(program))])
+    bump_version("programs")
     return program
 
+class RevisionConflictError(Exception):
+    """Програму змінили паралельно: ревізія в базі не збігається з очікуваною."""
+
+class ConcurrentUpdateError(Exception):
+    """Програму змінювали паралельно під час кожної зі спроб оновлення (клієнт ревізію не задавав)."""
+
+# Скільки разів повторювати перевірку перетинів і запис, якщо програму змінили між ними
+PROGRAM_PATCH_ATTEMPTS = 3
+
+async def program_exists(program_id: PydanticObjectId) -> bool:
+    """Чи є програма з таким ID."""
+    return bool(await TVProgram.get_motor_collection().count_documents({"_id": program_id}, limit=1))
+
+async def patch_tv_program(
+    program_id: PydanticObjectId,
+    changes: TVProgramUpdate,
+    expected_revision: Optional[int] = None,
+) -> Optional[dict]:
+    """
+    Частково оновлює програму одним find_one_and_update і повертає її новий стан
+    (у форматі TVProgramResponse). Повертає None, якщо програму або новий канал не знайдено.
+    Якщо задано expected_revision і він не збігається з поточним, викликає RevisionConflictError.
+    Зміна часу чи каналу перевіряється на перетини (InvalidProgramTimesError, ScheduleOverlapError);
+    якщо програму змінили між перевіркою і записом, спроба повторюється (ConcurrentUpdateError, коли спроби скінчилися).
+    """
+    # Явний null допускаємо лише для тегів - решта полів обов'язкові
+    update_fields = {
+        field: value
+        for field, value in changes.model_dump(exclude_unset=True).items()
+        if value is not None or field == "tags"
+    }
+    if "channel_id" in update_fields:
+        try:
+            channel_object_id = PydanticObjectId(update_fields.pop("channel_id"))
+        except Exception:
+            print(f"Помилка оновлення: Невалідний формат нового channel_id: {changes.channel_id}")
+            return None
+        # Перевірка каналу через каталог, без окремого запиту до Mongo
+        new_channel = await channel_catalog.get(channel_object_id)
+        if not new_channel:
+            print(f"Помилка оновлення: Новий канал з ID {changes.channel_id} не знайдений.")
+            return None
+        update_fields["channel"] = DBRef(TVChannel.get_collection_name(), channel_object_id)
+        snapshot = channel_snapshot(new_channel)
+        if snapshot is not None:
+            update_fields["channel_snapshot"] = snapshot.model_dump()
+
+    collection = TVProgram.get_motor_collection()
+    checks_overlap = bool({"start_time", "end_time", "channel"} & update_fields.keys())
+    for _ in range(PROGRAM_PATCH_ATTEMPTS if checks_overlap else 1):
+        fields = dict(update_fields)
+        read_revision = expected_revision
+        if checks_overlap:
+            # Зміна часу чи каналу: перевіряємо перетини з повним новим проміжком, тож потрібен поточний стан.
+            # Оновлення далі застосовується лише до прочитаної ревізії - інакше перевірка могла застаріти.
+            current = await collection.find_one({"_id": program_id}, {"start_time": 1, "end_time": 1, "channel": 1, "revision": 1})
+            if current is None:
+                return None
+            read_revision = current.get("revision") or 0
+            if expected_revision is not None and expected_revision != read_revision:
+                raise RevisionConflictError()
+            channel_id = fields["channel"].id if "channel" in fields else current["channel"].id
+            fields["start_time"], fields["end_time"] = await check_program_overlap(
+                channel_id,
+                fields.get("start_time", current["start_time"]),
+                fields.get("end_time", current["end_time"]),
+                exclude_id=program_id,
+            )
+
+        query: dict = {"_id": program_id}
+        if read_revision is not None:
+            # У документах, створених до появи ревізій, поля немає - вважаємо його нулем
+            query["revision"] = {"$in": [0, None]} if read_revision == 0 else read_revision
+
+        document = await collection.find_one_and_update(
+            query,
+            {"$set": fields, "$inc": {"revision": 1}},
+            projection=PROGRAM_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+        )
+        if document is not None:
+            break
+        # Оновлення не відбулося: або програми немає, або ревізія застаріла
+        if read_revision is None or not await program_exists(program_id):
+            return None
+        if expected_revision is not None:
+            raise RevisionConflictError()
+        # Ревізію прочитали ми самі: програму змінили між перевіркою перетинів і записом - перевіряємо знову
+    else:
+        raise ConcurrentUpdateError()
+
+    # Без зміни часу чи каналу доби програми не змінилися - їх позначить _add_to_channel_days
+    placement = (current["channel"].id, current["start_time"], current["end_time"]) if checks_overlap else None
+    await _remove_from_channel_days(program_id, placement)
+    await _add_to_channel_days([(document["channel"].id, document)])
+    bump_version("programs")
+    return (await program_documents_to_dicts([document]))[0]
+
 async def delete_tv_program(program_id: PydanticObjectId) -> bool:
     """Видаляє програму за ID."""
     program = await TVProgram.get(program_id)
     if program:
         await program.delete()
+        channel_id = program_channel_id(program)
+        await _remove_from_channel_days(program_id, (channel_id, program.start_time, program.end_time) if channel_id else None)
+        bump_version("programs")
         return True # Успішно видалено
     return False # Програма не знайдена
 
+# --- Сітка мовлення (EPG) ---
+
+def _as_naive_utc(value: datetime) -> datetime:
+    """Приводить час до naive UTC - у такому вигляді PyMongo повертає дати з бази."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+async def _find_channels(channel_ids: Optional[List[PydanticObjectId]] = None) -> List[TVChannel]:
+    """Отримує вказані канали (або всі, якщо список не задано) з каталогу каналів."""
+    if channel_ids:
+        channels_by_id = await channel_catalog.get_many(channel_ids)
+        return [channels_by_id[channel_id] for channel_id in dict.fromkeys(channel_ids) if channel_id in channels_by_id]
+    return await channel_catalog.all()
+
+async def get_schedule(
+    start: datetime,
+    end: datetime,
+    channel_ids: Optional[List[PydanticObjectId]] = None,
+) -> List[Tuple[TVChannel, List[TVProgram]]]:
+    """
+    Отримує сітку мовлення за часове вікно [start, end), згруповану за каналами.
+    Програми вибираються одним запитом по індексу channel_start_end_index
+    (і ще одним до архіву, якщо вікно починається до межі архівації).
+    """
+    channels = await _find_channels(channel_ids)
+    if not channels:
+        return []
+
+    # Програма потрапляє у вікно, якщо вона починається до його кінця і закінчується після його початку
+    query = program_window_query(start, end, [channel.id for channel in channels])
+    programs = []
+    for model in _program_models(reads_archive(start)):
+        programs += await model.find(query).sort([("start_time", ASCENDING)]).to_list()
+    programs.sort(key=lambda program: program.start_time)
+
+    channels_by_id = {channel.id: channel for channel in channels}
+    programs_by_channel = {channel.id: [] for channel in channels}
+    for program in programs:
+        program.channel = channels_by_id[program.channel.ref.id]
+        programs_by_channel[program.channel.id].append(program)
+    return [(channel, programs_by_channel[channel.id]) for channel in channels]
+
+async def _get_channel_now_next(channel: TVChannel, at: datetime) -> Tuple[Optional[TVProgram], Optional[TVProgram]]:
+    """Повертає поточну та наступну програму каналу на момент at."""
+    at = _as_naive_utc(at)
+    upcoming = await TVProgram.find({
+        "channel.$id": channel.id,
+        "end_time": {"$gt": at},
+    }).sort([("start_time", ASCENDING)]).limit(2).to_list()
+    for program in upcoming:
+        program.channel = channel
+
+    if upcoming and upcoming[0].start_time <= at:
+        return upcoming[0], upcoming[1] if len(upcoming) > 1 else None
+    return None, upcoming[0] if upcoming else None
+
+async def get_channel_now_next_documents(
+    channel_id: PydanticObjectId,
+    at: datetime,
+) -> Tuple[Optional[dict], Optional[dict]]:
+    """Поточна та наступна програма каналу на момент at (у форматі TVProgramResponse, без гідратації)."""
+    at = _as_naive_utc(at)
+    documents = await TVProgram.get_motor_collection().find(
+        {"channel.$id": channel_id, "end_time": {"$gt": at}}, PROGRAM_PROJECTION
+    ).sort([("start_time", ASCENDING)]).limit(2).to_list(length=2)
+    upcoming = await program_documents_to_dicts(documents)
+
+    if upcoming and upcoming[0]["start_time"] <= at:
+        return upcoming[0], upcoming[1] if len(upcoming) > 1 else None
+    return None, upcoming[0] if upcoming else None
+
+async def get_now_next(
+    at: datetime,
+    channel_ids: Optional[List[PydanticObjectId]] = None,
+) -> List[Tuple[TVChannel, Optional[TVProgram], Optional[TVProgram]]]:
+    """Отримує "зараз / далі" для кожного каналу (запити по каналах виконуються паралельно)."""
+    channels = await _find_channels(channel_ids)
+    results = await asyncio.gather(*(_get_channel_now_next(channel, at) for channel in channels))
+    return [(channel, now, upcoming) for channel, (now, upcoming) in zip(channels, results)]
+
+# --- Пошук програм ---
+
+async def search_tv_programs(
+    q: Optional[str] = None,
+    tags: Optional[List[str]] = None,
+    channel_ids: Optional[List[PydanticObjectId]] = None,
+    limit: int = 20,
+    skip: int = 0,
+) -> dict:
+    """
+    Шукає програми за текстом (текстовий індекс по title і description) та тегами.
+    Одна агрегація повертає сторінку результатів, загальну кількість і фасети по тегах і каналах.
+    """
+    match: dict = {}
+    if q:
+        match["$text"] = {"$search": q}
+    if tags:
+        match["tags"] = {"$all": tags}
+    if channel_ids:
+        match["channel.$id"] = {"$in": list(channel_ids)}
+
+    pipeline: List[dict] = [{"$match": match}]
+    if q:
+        pipeline.append({"$addFields": {"score": {"$meta": "textScore"}}})
+        sort = {"score": -1, "start_time": 1, "_id": 1}
+    else:
+        sort = {"start_time": 1, "_id": 1}
+
+    pipeline.append({"$facet": {
+        "items": [{"$sort": sort}, {"$skip": skip}, {"$limit": limit}],
+        "total": [{"$count": "count"}],
+        "tags": [
+            {"$unwind": "$tags"},
+            {"$group": {"_id": "$tags", "count": {"$sum": 1}}},
+            {"$sort": {"count": -1, "_id": 1}},
+            {"$limit": PROGRAM_SEARCH_TAG_FACETS},
+        ],
+        # Поле "$id" у DBRef не можна адресувати шляхом "$channel.$id", тому використовуємо $getField
+        "channels": [
+            {"$group": {
+                "_id": {"$getField": {"field": {"$literal": "$id"}, "input": "$channel"}},
+                "count": {"$sum": 1},
+            }},
+            {"$sort": {"count": -1}},
+        ],
+    }})
+
+    results = await TVProgram.get_motor_collection().aggregate(pipeline).to_list(length=1)
+    facets = results[0] if results else {"items": [], "total": [], "tags": [], "channels": []}
+
+    channel_ids_found = [getattr(document.get("channel"), "id", None) for document in facets["items"]]
+    channel_ids_found += [bucket["_id"] for bucket in facets["channels"]]
+    channels_by_id = await channel_catalog.get_many(
+        channel_id for channel_id in channel_ids_found if channel_id is not None
+    )
+    return {
+        "items": [program_document_to_dict(document, channels_by_id) for document in facets["items"]],
+        "total": facets["total"][0]["count"] if facets["total"] else 0,
+        "facets": {
+            "tags": [{"value": bucket["_id"], "count": bucket["count"]} for bucket in facets["tags"]],
+            "channels": [
+                {
+                    "channel_id": bucket["_id"],
+                    "name": channels_by_id[bucket["_id"]].name if bucket["_id"] in channels_by_id else None,
+                    "count": bucket["count"],
+                }
+                for bucket in facets["channels"]
+                if bucket["_id"] is not None
+            ],
+        },
+    }
+
+# --- Експорт розкладу ---
+
+def program_window_query(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    channel_ids: Optional[List[PydanticObjectId]] = None,
+) -> dict:
+    """Умова вибірки програм, що перетинаються з вікном [start, end), на вказаних каналах."""
+    query: dict = {}
+    if channel_ids:
+        query["channel.$id"] = {"$in": list(channel_ids)}
+    if end is not None:
+        query["start_time"] = {"$lt": end}
+    if start is not None:
+        query["end_time"] = {"$gt": start}
+    return query
+
+async def iter_program_documents(
+    query: dict,
+    projection: Optional[dict] = None,
+    batch_size: int = PROGRAM_EXPORT_BATCH_SIZE,
+    include_archive: bool = False,
+) -> AsyncIterator[dict]:
+    """
+    Читає "сирі" документи програм курсором Motor (без гідратації в TVProgram),
+    відсортовані за часом початку. З include_archive зливає їх з документами архіву.
+    """
+    cursors = [
+        model.get_motor_collection().find(query, projection or PROGRAM_PROJECTION, batch_size=batch_size).sort(PROGRAM_KEYSET_SORT)
+        for model in _program_models(include_archive)
+    ]
+    if len(cursors) == 1:
+        async for document in cursors[0]:
+            yield document
+        return
+    async for document in _merge_by_start(cursors[0], cursors[1]):
+        yield document
+
+async def _merge_by_start(first: AsyncIterator[dict], second: AsyncIterator[dict]) -> AsyncIterator[dict]:
+    """Зливає два відсортовані за (start_time, _id) потоки документів в один."""
+    async def next_or_none(iterator: AsyncIterator[dict]) -> Optional[dict]:
+        try:
+            return await iterator.__anext__()
+        except StopAsyncIteration:
+            return None
+
+    left, right = await next_or_none(first), await next_or_none(second)
+    while left is not None or right is not None:
+        if right is None or (left is not None and (left["start_time"], left["_id"]) <= (right["start_time"], right["_id"])):
+            yield left
+            left = await next_or_none(first)
+        else:
+            yield right
+            right = await next_or_none(second)
+
+# --- Архів програм, що вже вийшли в ефір ---
+# Гаряча колекція programs містить лише свіжі й майбутні програми; старі переносить archive_aired_programs
+# (фонова задача з archive.py або `python manage.py archive`). Архів читається лише тоді,
+# коли явно запитано вікно, що починається до межі архівації.
+
+def archive_cutoff(now: Optional[datetime] = None) -> datetime:
+    """Межа архівації: програми, що закінчилися раніше, вважаються архівними."""
+    return _as_naive_utc(now or datetime.now(timezone.utc)) - timedelta(days=PROGRAM_ARCHIVE_AFTER_DAYS)
+
+def reads_archive(start: Optional[datetime]) -> bool:
+    """Чи потрібен архів для вікна, що починається з start (без явного початку - ні)."""
+    return start is not None and _as_naive_utc(start) < archive_cutoff()
+
+def _program_models(include_archive: bool) -> list:
+    return [TVProgram, ArchivedTVProgram] if include_archive else [TVProgram]
+
+async def archive_aired_programs(
+    cutoff: Optional[datetime] = None,
+    batch_size: int = PROGRAM_ARCHIVE_BATCH_SIZE,
+    pause_seconds: float = PROGRAM_ARCHIVE_PAUSE_SECONDS,
+) -> int:
+    """
+    Переносить програми, що закінчилися до cutoff, у programs_archive пачками по batch_size
+    з паузою pause_seconds між ними. Повертає кількість перенесених програм.
+
+    Кожна пачка спершу записується в архів (upsert, тож повтор після збою безпечний), а потім
+    видаляється з programs лише за тією ж ревізією: програму, змінену між читанням і видаленням,
+    буде перенесено наступного разу. Доби каналів (channel_days) не змінюються.
+    Якщо процес зупинити між цими кроками, програма до наступного запуску буде в обох колекціях.
+    """
+    cutoff = _as_naive_utc(cutoff) if cutoff is not None else archive_cutoff()
+    live = TVProgram.get_motor_collection()
+    archive = ArchivedTVProgram.get_motor_collection()
+    # Умова за start_time звужує вибірку індексом start_time_asc_index; end_time перевіряється на знайдених
+    query = {"start_time": {"$lt": cutoff}, "end_time": {"$lt": cutoff}}
+    archived = 0
+    while True:
+        batch = await live.find(query).sort("start_time", ASCENDING).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        await archive.bulk_write([ReplaceOne({"_id": document["_id"]}, document, upsert=True) for document in batch], ordered=False)
+        result = await live.bulk_write(
+            [DeleteOne({"_id": document["_id"], "revision": document.get("revision")}) for document in batch],
+            ordered=False,
+        )
+        archived += result.deleted_count
+        if result.deleted_count < len(batch):
+            # Змінені паралельно програми лишаються в programs - прибираємо їхні копії з архіву, щоб не було дублів.
+            # Лише копії прочитаної ревізії: новішу могла вже перенести інша архівація
+            revisions = {document["_id"]: document.get("revision") for document in batch}
+            remaining = [document["_id"] async for document in live.find({"_id": {"$in": list(revisions)}}, {"_id": 1})]
+            if remaining:
+                await archive.bulk_write(
+                    [DeleteOne({"_id": program_id, "revision": revisions[program_id]}) for program_id in remaining],
+                    ordered=False,
+                )
+        if len(batch) < batch_size or not result.deleted_count:
+            break
+        await asyncio.sleep(pause_seconds)
+    if archived:
+        bump_version("programs")
+    return archived
+
+async def archived_program_ids(program_ids: Iterable[PydanticObjectId]) -> Set[PydanticObjectId]:
+    """
+    Які з програм є в архіві (видалення з programs під час архівації - не справжнє видалення).
+    Один запит $in на весь список.
+    """
+    program_ids = list(program_ids)
+    if not program_ids:
+        return set()
+    cursor = ArchivedTVProgram.get_motor_collection().find({"_id": {"$in": program_ids}}, {"_id": 1})
+    return {document["_id"] async for document in cursor}
+
+# --- Матеріалізований розклад каналу на добу ---
+# Кожен документ channel_days - готовий список програм каналу за одну добу (UTC).
+# Записи програм оновлюють документи діб атомарними $pull/$push і збільшують у них version;
+# якщо доби ще немає, запис створює її з позначкою pending ("ще не побудована").
+# Таку добу будує перше читання і зберігає, лише якщо version за час побудови не змінилася,
+# а `python manage.py rebuild-days` перебудовує всі.
+
+CHANNEL_DAY_FORMAT = "%Y-%m-%d"
+CHANNEL_DAY_FIELDS = {"title", "description", "start_time", "end_time", "tags", "revision"}
+
+def program_days(start_time: datetime, end_time: datetime) -> List[str]:
+    """Доби (UTC), які перетинає програма; програма через північ потрапляє в обидві."""
+    start_time, end_time = _as_naive_utc(start_time), _as_naive_utc(end_time)
+    day = datetime(start_time.year, start_time.month, start_time.day)
+    days = [day.strftime(CHANNEL_DAY_FORMAT)]
+    day += timedelta(days=1)
+    while day < end_time:
+        days.append(day.strftime(CHANNEL_DAY_FORMAT))
+        day += timedelta(days=1)
+    return days
+
+def channel_day_entry(document: dict) -> dict:
+    """Програма у форматі TVProgramResponseBase для збереження в документі доби."""
+    return {
+        "id": document["_id"],
+        "title": document.get("title"),
+        "description": document.get("description"),
+        "start_time": _as_naive_utc(document["start_time"]),
+        "end_time": _as_naive_utc(document["end_time"]),
+        "tags": document.get("tags"),
+        "revision": document.get("revision", 0),
+    }
+
+def _program_as_document(program: TVProgram) -> dict:
+    return {"_id": program.id, **program.model_dump(include=CHANNEL_DAY_FIELDS)}
+
+def _channel_day_marker(channel_id: PydanticObjectId, day: str, update: dict) -> UpdateMany:
+    """
+    Оновлення доби, що збільшує її version (і створює добу з позначкою pending, якщо її немає).
+    Доба унікальна (channel_date_unique_index), тож UpdateMany зачіпає щонайбільше один документ,
+    але, на відміну від UpdateOne, не передає в bulk_write параметр sort (його не знає mongomock).
+    """
+    return UpdateMany(
+        {"channel_id": channel_id, "date": day},
+        {**update, "$inc": {"version": 1}, "$setOnInsert": {"pending": True}},
+        upsert=True,
+    )
+
+async def _add_to_channel_days(programs: Iterable[Tuple[PydanticObjectId, dict]]) -> None:
+    """Додає програми (ID каналу, "сирий" документ) у доби одним bulk_write."""
+    entries_by_day: dict = {}
+    for channel_id, document in programs:
+        entry = channel_day_entry(document)
+        for day in program_days(entry["start_time"], entry["end_time"]):
+            entries_by_day.setdefault((channel_id, day), []).append(entry)
+    if not entries_by_day:
+        return
+    await ChannelDay.get_motor_collection().bulk_write([
+        _channel_day_marker(channel_id, day, {"$push": {"programs": {"$each": entries, "$sort": {"start_time": 1}}}})
+        for (channel_id, day), entries in entries_by_day.items()
+    ], ordered=False)
+
+async def _remove_from_channel_days(
+    program_id: PydanticObjectId,
+    placement: Optional[Tuple[PydanticObjectId, datetime, datetime]] = None,
+) -> None:
+    """
+    Прибирає програму з усіх діб, де вона є (індекс programs_id_index).
+    placement - канал, початок і кінець програми до зміни: їхні доби теж позначаються зміненими,
+    щоб побудова доби, що вже прочитала програму, не зберегла її.
+    """
+    collection = ChannelDay.get_motor_collection()
+    await collection.update_many(
+        {"programs.id": program_id},
+        {"$pull": {"programs": {"id": program_id}}, "$inc": {"version": 1}},
+    )
+    if placement is not None:
+        channel_id, start_time, end_time = placement
+        await collection.bulk_write(
+            [_channel_day_marker(channel_id, day, {}) for day in program_days(start_time, end_time)],
+            ordered=False,
+        )
+
+async def _build_channel_day(channel_id: PydanticObjectId, day: str) -> List[dict]:
+    """Збирає програми каналу за добу з колекції програм."""
+    day_start = datetime.strptime(day, CHANNEL_DAY_FORMAT)
+    query = program_window_query(day_start, day_start + timedelta(days=1), [channel_id])
+    documents = iter_program_documents(query, include_archive=reads_archive(day_start))
+    return [channel_day_entry(document) async for document in documents]
+
+async def get_channel_day(channel_id: PydanticObjectId, day: date) -> Optional[dict]:
+    """
+    Розклад каналу на добу одним читанням документа channel_days (у форматі ChannelDayResponse).
+    Якщо доби ще немає (або вона pending), вона будується з програм і зберігається,
+    якщо за час побудови її ніхто не змінив. Повертає None, якщо каналу немає.
+    """
+    channel = await channel_catalog.get(channel_id)
+    if channel is None:
+        return None
+    day_key = day.strftime(CHANNEL_DAY_FORMAT)
+
+    collection = ChannelDay.get_motor_collection()
+    document = await collection.find_one({"channel_id": channel_id, "date": day_key}, {"programs": 1, "pending": 1, "version": 1})
+    if document is not None and not document.get("pending"):
+        programs = document["programs"]
+    else:
+        programs = await _build_channel_day(channel_id, day_key)
+        if document is None:
+            # $setOnInsert: якщо доба вже з'явилася паралельно (запис програми чи інше читання), не перезаписуємо її
+            await collection.update_one(
+                {"channel_id": channel_id, "date": day_key},
+                {"$setOnInsert": {"programs": programs}},
+                upsert=True,
+            )
+        else:
+            # Зберігаємо, лише якщо під час побудови записів у добу не було - інакше побудова могла застаріти
+            await collection.update_one(
+                {"channel_id": channel_id, "date": day_key, "version": document.get("version")},
+                {"$set": {"programs": programs}, "$unset": {"pending": ""}},
+            )
+    return {
+        "channel": {"id": channel.id, "name": channel.name, "country": channel.country},
+        "date": day_key,
+        "programs": programs,
+    }
+
+async def rebuild_channel_days(batch_size: int = PROGRAM_EXPORT_BATCH_SIZE) -> int:
+    """
+    Перебудовує всі доби всіх каналів з колекції програм та архіву (відновлення після збоїв
+    чи ручних змін у базі). Повертає кількість записаних діб.
+    """
+    collection = ChannelDay.get_motor_collection()
+    channels = await channel_catalog.all()
+    written = 0
+    for channel in channels:
+        days: dict = {}
+        async for document in iter_program_documents({"channel.$id": channel.id}, batch_size=batch_size, include_archive=True):
+            entry = channel_day_entry(document)
+            for day in program_days(entry["start_time"], entry["end_time"]):
+                days.setdefault(day, []).append(entry)
+
+        operations = [
+            ReplaceOne({"channel_id": channel.id, "date": day}, {"channel_id": channel.id, "date": day, "programs": programs}, upsert=True)
+            for day, programs in days.items()
+        ]
+        for i in range(0, len(operations), batch_size):
+            await collection.bulk_write(operations[i:i + batch_size], ordered=False)
+        # Доби, в яких програм більше немає
+        await collection.delete_many({"channel_id": channel.id, "date": {"$nin": list(days)}})
+        written += len(days)
+    # Доби видалених каналів
+    await collection.delete_many({"channel_id": {"$nin": [channel.id for channel in channels]}})
+    return written
+
 # --- TVChannel CRUD ---
 
 async def get_all_channels() -> List[TVChannel]:
-    """Отримує всі канали (без програм)."""
-    return await TVChannel.find_all().to_list()
+    """Отримує всі канали (без програм) з каталогу каналів."""
+    return await channel_catalog.all()
 
-async def get_channel_and_programs(channel_id: PydanticObjectId) -> Optional[TVChannel]:
-    """Отримує канал за ID та пов'язані з ним програми."""
+async def create_channel(channel_data: TVChannelCreate) -> TVChannel:
+    """Створює новий канал і скидає каталог каналів."""
+    db_channel = TVChannel(name=channel_data.name, country=channel_data.country)
+    await db_channel.insert()
+    channel_catalog.invalidate()
+    bump_version("channels")
+    return db_channel
+
+async def update_channel(channel_id: PydanticObjectId, channel_data: TVChannelCreate) -> Optional[TVChannel]:
+    """Оновлює канал і скидає каталог каналів."""
     channel = await TVChannel.get(channel_id)
     if not channel:
         return None
+    channel.name = channel_data.name
+    channel.country = channel_data.country
+    await channel.save()
+    channel_catalog.invalidate()
+    bump_version("channels")
+    return channel
+
+def _snapshot_fields(channel: TVChannel) -> dict:
+    return {"id": channel.id, "name": channel.name, "country": channel.country}
 
-    programs = await TVProgram.find(TVProgram.channel.id == channel.id).to_list()
+async def fan_out_channel_snapshot(channel: TVChannel) -> int:
+    """
+    Оновлює знімок каналу в усіх його програмах, які вже мають знімок, одним update_many
+    (запускається у фоні після зміни каналу), зокрема в архіві. Повертає кількість змінених програм.
+    """
+    modified = 0
+    for model in _program_models(include_archive=True):
+        result = await model.get_motor_collection().update_many(
+            {"channel.$id": channel.id, "channel_snapshot": {"$ne": None}},
+            {"$set": {"channel_snapshot": _snapshot_fields(channel)}},
+        )
+        modified += result.modified_count
+    if modified:
+        bump_version("programs")
+    print(f"Знімок каналу {channel.name} оновлено в {modified} програмах.")
+    return modified
 
-    # Завантажуємо посилання на канал для кожної програми (щоб уникнути помилок при серіалізації)
-    for prog in programs:
-         if prog.channel:
-              await prog.fetch_link(TVProgram.channel)
+async def backfill_channel_snapshots() -> int:
+    """Одноразова міграція: записує знімки каналів у всі існуючі програми (один update_many на канал)."""
+    collection = TVProgram.get_motor_collection()
+    updated = 0
+    for channel in await channel_catalog.all():
+        result = await collection.update_many(
+            {"channel.$id": channel.id},
+            {"$set": {"channel_snapshot": _snapshot_fields(channel)}},
+        )
+        updated += result.modified_count
+    if updated:
+        bump_version("programs")
+    return updated
+
+async def check_channel_snapshots() -> dict:
+    """
+    Перевіряє узгодженість знімків: для кожного каналу рахує програми без знімка
+    та програми, чий знімок розходиться з поточними даними каналу.
+    """
+    collection = TVProgram.get_motor_collection()
+    report = {"channels": [], "missing": 0, "drifted": 0}
+    for channel in await channel_catalog.all():
+        missing = await collection.count_documents({"channel.$id": channel.id, "channel_snapshot": None})
+        drifted = await collection.count_documents({
+            "channel.$id": channel.id,
+            "channel_snapshot": {"$ne": None},
+            "$or": [
+                {"channel_snapshot.id": {"$ne": channel.id}},
+                {"channel_snapshot.name": {"$ne": channel.name}},
+                {"channel_snapshot.country": {"$ne": channel.country}},
+            ],
+        })
+        report["channels"].append({"channel_id": str(channel.id), "name": channel.name, "missing": missing, "drifted": drifted})
+        report["missing"] += missing
+        report["drifted"] += drifted
+    return report
+
+async def get_channel_with_program_documents(
+    channel_id: PydanticObjectId,
+    projection: Optional[dict] = None,
+) -> Optional[dict]:
+    """
+    Отримує канал з каталогу та його програми одним запитом з проєкцією
+    (у форматі TVChannelResponse, без гідратації документів).
+    """
+    channel = await channel_catalog.get(channel_id)
+    if not channel:
+        return None
 
-    return channel, programs
+    documents = await TVProgram.get_motor_collection().find(
+        {"channel.$id": channel.id}, projection or PROGRAM_PROJECTION
+    ).sort([("start_time", ASCENDING)]).to_list(length=None)
+    channels_by_id = {channel.id: channel}
+    return {
+        "id": channel.id,
+        "name": channel.name,
+        "country": channel.country,
+        "programs": [program_document_to_dict(document, channels_by_id) for document in documents],
+    }
 
 # --- User CRUD ---
 
@@ -123,11 +1239,13 @@ async def get_user_by_username(username: str) -> Optional[User]:
 
 async def create_user(user_data: UserCreate) -> User:
     """Створює нового користувача."""
-    hashed_password = hash_password(user_data.password)
+    hashed_password = await hash_password_async(user_data.password)
     db_user = User(
         username=user_data.username,
         password_hash=hashed_password,
         role=user_data.role or 'user'
     )
     await db_user.insert()
+    # Скидаємо можливі закешовані записи користувача з таким ім'ям
+    principal_cache.invalidate_user(db_user.username)
     return db_user
@@ -1,12 +1,19 @@
+import asyncio
 import os
+import threading
+import time
 import motor.motor_asyncio # Асинхронний драйвер MongoDB
 from beanie import init_beanie
 from dotenv import load_dotenv
-from typing import List, Type # Для списку моделей
+from pymongo import monitoring
+from pymongo.errors import OperationFailure
+from typing import Dict, List, Optional, Type # Для списку моделей
 
 # Імпортуємо майбутні моделі (поки що вони не визначені, але імпорт потрібен для init_beanie)
 # Ми створимо їх у наступному кроці
-from models import User, TVChannel, TVProgram # Припустимо, що моделі будуть у models.py
+from models import User, TVChannel, TVProgram, ArchivedTVProgram, ChannelDay # Припустимо, що моделі будуть у models.py
+from cache import channel_catalog
+from metrics import command_metrics
 
 load_dotenv()
 
@@ -18,46 +25,237 @@ if not MONGODB_URI:
 if not DATABASE_NAME:
     raise ValueError("DATABASE_NAME не встановлено в .env")
 
-DOCUMENT_MODELS: List[Type["Document"]] = [User, TVChannel, TVProgram] # type: ignore # Поки що ігноруємо помилку типів
+def _optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
 
-async def init_db_connection():
+# Швидкий старт воркера: без синхронізації індексів, початкових даних і прогріву кешів.
+# Увімкнений за замовчуванням - індекси й початкові дані готують `python manage.py migrate` / `seed`
+FAST_START = os.getenv("FAST_START", "1").lower() in ("1", "true", "yes")
+
+# --- Налаштування пулу з'єднань ---
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", 100))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", 0))
+MONGODB_MAX_IDLE_TIME_MS = _optional_int("MONGODB_MAX_IDLE_TIME_MS")
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = _optional_int("MONGODB_WAIT_QUEUE_TIMEOUT_MS")
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", 30000))
+MONGODB_CONNECT_TIMEOUT_MS = int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", 20000))
+# Скільки чекати на ping у перевірці готовності
+MONGODB_READY_TIMEOUT_SECONDS = float(os.getenv("MONGODB_READY_TIMEOUT_SECONDS", 2))
+
+def pool_options() -> dict:
+    """Параметри пулу для AsyncIOMotorClient (незадані значення лишаються за замовчуванням драйвера)."""
+    options = {
+        "maxPoolSize": MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": MONGODB_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGODB_CONNECT_TIMEOUT_MS,
+    }
+    return {name: value for name, value in options.items() if value is not None}
+
+# --- Моніторинг пулу з'єднань ---
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Рахує видачі з'єднань з пулу та час очікування на них (події PyMongo CMAP).
+    PyMongo викликає ці методи з потоків драйвера, тому лічильники захищені блокуванням.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.connections_open = 0
+        self.checkouts_started = 0
+        self.checked_out = 0
+        self.checked_in = 0
+        self.checkout_failures = {}
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _checkout_duration(self, event) -> float:
+        # Старіші версії PyMongo не передають duration - рахуємо самі
+        duration = getattr(event, "duration", None)
+        if duration is None:
+            started = getattr(self._local, "started", None)
+            duration = time.monotonic() - started if started is not None else 0.0
+        return duration
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.monotonic()
+        with self._lock:
+            self.checkouts_started += 1
+
+    def connection_checked_out(self, event):
+        duration = self._checkout_duration(event)
+        with self._lock:
+            self.checked_out += 1
+            self.wait_time_total += duration
+            self.wait_time_max = max(self.wait_time_max, duration)
+
+    def connection_check_out_failed(self, event):
+        duration = self._checkout_duration(event)
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+            self.wait_time_max = max(self.wait_time_max, duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_in += 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections_open += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections_open -= 1
+
+    def connection_ready(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "connections_open": self.connections_open,
+                "in_use": self.checked_out - self.checked_in,
+                "checkouts_started": self.checkouts_started,
+                "checked_out": self.checked_out,
+                "checkout_failures": dict(self.checkout_failures),
+                "wait_time_avg_ms": round(self.wait_time_total / self.checked_out * 1000, 3) if self.checked_out else 0.0,
+                "wait_time_max_ms": round(self.wait_time_max * 1000, 3),
+            }
+
+pool_stats = PoolStatsListener()
+
+# Клієнт створюється при старті застосунку і закривається при зупинці
+client: Optional[motor.motor_asyncio.AsyncIOMotorClient] = None
+
+def get_client() -> motor.motor_asyncio.AsyncIOMotorClient:
+    """Повертає клієнта MongoDB (після init_db_connection)."""
+    if client is None:
+        raise RuntimeError("Підключення до MongoDB ще не ініціалізовано")
+    return client
+
+async def ping_db() -> None:
+    """Перевіряє, що MongoDB відповідає (з таймаутом готовності)."""
+    await asyncio.wait_for(get_client().admin.command("ping"), timeout=MONGODB_READY_TIMEOUT_SECONDS)
+
+def close_db_connection() -> None:
+    """Закриває клієнта MongoDB. Викликається при зупинці FastAPI."""
+    global client
+    if client is not None:
+        client.close()
+        client = None
+        print("Підключення до MongoDB закрито.")
+
+DOCUMENT_MODELS: List[Type["Document"]] = [User, TVChannel, TVProgram, ArchivedTVProgram, ChannelDay] # type: ignore # Поки що ігноруємо помилку типів
+
+async def seed_channels() -> None:
+    """Додає початкові канали, якщо колекція каналів порожня."""
+    print("Перевірка наявності початкових каналів...")
+    channel_count = await TVChannel.count() # Перевіряємо кількість документів у колекції
+    if channel_count == 0:
+        print("Колекція каналів порожня. Додавання початкових каналів...")
+        initial_channels = [
+            TVChannel(name="Discovery", country="USA"),
+            TVChannel(name="National Geographic", country="USA"),
+            TVChannel(name="BBC News", country="UK"),
+            TVChannel(name="CNN", country="USA")
+        ]
+        # Використовуємо insert_many для додавання списку документів
+        await TVChannel.insert_many(initial_channels)
+        channel_catalog.invalidate()
+        print(f"Додано {len(initial_channels)} початкових каналів.")
+    else:
+        print(f"У колекції вже є {channel_count} каналів. Додавання пропущено.")
+
+async def enable_program_pre_images() -> bool:
+    """
+    Вмикає для колекції programs збереження стану документа до зміни (MongoDB 6.0+).
+    З ним change stream у live.py знає старий канал перенесеної чи видаленої програми.
+    """
+    try:
+        await get_client()[DATABASE_NAME].command(
+            "collMod", TVProgram.get_collection_name(), changeStreamPreAndPostImages={"enabled": True}
+        )
+    except OperationFailure as e:
+        print(f"Стан програм до зміни не ввімкнено: {e}")
+        return False
+    return True
+
+async def sync_indexes() -> Dict[str, List[str]]:
+    """
+    Створює та оновлює індекси всіх моделей (init_beanie без skip_indexes).
+    Повертає назви індексів кожної колекції після синхронізації.
+    """
+    await init_beanie(database=get_client()[DATABASE_NAME], document_models=DOCUMENT_MODELS)
+    return {
+        model.get_collection_name(): sorted(await model.get_motor_collection().index_information())
+        for model in DOCUMENT_MODELS
+    }
+
+async def init_db_connection(fast_start: Optional[bool] = None, sync_indexes: Optional[bool] = None, seed: Optional[bool] = None):
     """
     Ініціалізує підключення до MongoDB та Beanie.
     Викликається при старті FastAPI.
+
+    У швидкому режимі (FAST_START=1) воркер не перевіряє індекси, не додає початкові канали,
+    не робить ping і не прогріває каталог каналів - цим займається `python manage.py migrate` / `seed`.
+    sync_indexes та seed явно перевизначають поведінку режиму.
     """
+    global client
+    if fast_start is None:
+        fast_start = FAST_START
+    if sync_indexes is None:
+        sync_indexes = not fast_start
+    if seed is None:
+        seed = not fast_start
+
     print(f"Підключення до MongoDB Atlas: {MONGODB_URI[:20]}... База даних: {DATABASE_NAME}") # Логування для перевірки
     try:
-        # Створюємо асинхронного клієнта Motor
-        client = motor.motor_asyncio.AsyncIOMotorClient(MONGODB_URI)
+        # Створюємо асинхронного клієнта Motor (з'єднання відкриваються ліниво, при першому запиті)
+        client = motor.motor_asyncio.AsyncIOMotorClient(
+            MONGODB_URI,
+            event_listeners=[pool_stats, command_metrics],
+            **pool_options(),
+        )
 
-        # Перевірка з'єднання 
-        await client.admin.command('ping')
-        print("Ping до MongoDB успішний!")
+        if not fast_start:
+            # Перевірка з'єднання 
+            await client.admin.command('ping')
+            print("Ping до MongoDB успішний!")
 
         # Ініціалізуємо Beanie з клієнтом, базою даних та списком моделей
         await init_beanie(
             database=client[DATABASE_NAME], # Доступ до бази даних через клієнт
-            document_models=DOCUMENT_MODELS
+            document_models=DOCUMENT_MODELS,
+            skip_indexes=not sync_indexes,
         )
-        print(f"Beanie ініціалізовано для бази даних '{DATABASE_NAME}' з моделями: {[model.__name__ for model in DOCUMENT_MODELS]}")
+        print(f"Beanie ініціалізовано для бази даних '{DATABASE_NAME}' з моделями: {[model.__name__ for model in DOCUMENT_MODELS]}"
+              f"{'' if sync_indexes else ' (без перевірки індексів)'}")
+
         # --- Додавання початкових даних (канали) ---
-        print("Перевірка наявності початкових каналів...")
-        channel_count = await TVChannel.count() # Перевіряємо кількість документів у колекції
-        if channel_count == 0:
-            print("Колекція каналів порожня. Додавання початкових каналів...")
-            initial_channels = [
-                TVChannel(name="Discovery", country="USA"),
-                TVChannel(name="National Geographic", country="USA"),
-                TVChannel(name="BBC News", country="UK"),
-                TVChannel(name="CNN", country="USA")
-            ]
-            # Використовуємо insert_many для додавання списку документів
-            await TVChannel.insert_many(initial_channels)
-            print(f"Додано {len(initial_channels)} початкових каналів.")
-        else:
-            print(f"У колекції вже є {channel_count} каналів. Додавання пропущено.")
+        if seed:
+            await seed_channels()
+
+        # --- Завантажуємо каталог каналів у пам'ять (у швидкому режимі - при першому зверненні) ---
+        if not fast_start:
+            await channel_catalog.load()
+            print(f"Каталог каналів завантажено: {channel_catalog.stats()['size']} каналів.")
 
     except Exception as e:
         print(f"ПОМИЛКА: Не вдалося підключитися до MongoDB або ініціалізувати Beanie: {e}")
-        raise 
-
+        raise
@@ -0,0 +1,118 @@
+import csv
+import io
+import json
+import zlib
+from typing import AsyncIterator, Dict, List
+
+from beanie import PydanticObjectId
+from models import TVChannel
+import xmltv
+
+EXPORT_FORMATS = {
+    "xmltv": ("application/xml", "xml"),
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+CSV_COLUMNS = ["id", "title", "description", "start_time", "end_time", "channel_id", "channel_name", "tags"]
+
+# Скільки програм збирати в один шматок відповіді
+EXPORT_CHUNK_ROWS = 500
+
+def _channel_id(document: dict):
+    channel = document.get("channel")
+    return getattr(channel, "id", None)
+
+def _xmltv_chunk(documents: List[dict]) -> str:
+    return "".join(
+        xmltv.xmltv_programme(
+            xmltv_channel_id=str(_channel_id(document)),
+            title=document.get("title", ""),
+            description=document.get("description", ""),
+            start_time=document["start_time"],
+            end_time=document["end_time"],
+            tags=document.get("tags"),
+        )
+        for document in documents
+    )
+
+def _csv_chunk(documents: List[dict], channels_by_id: Dict[PydanticObjectId, TVChannel]) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for document in documents:
+        channel = channels_by_id.get(_channel_id(document))
+        writer.writerow([
+            str(document["_id"]),
+            document.get("title", ""),
+            document.get("description", ""),
+            document["start_time"].isoformat(),
+            document["end_time"].isoformat(),
+            str(_channel_id(document)),
+            channel.name if channel else "",
+            ";".join(document.get("tags") or []),
+        ])
+    return buffer.getvalue()
+
+def _ndjson_chunk(documents: List[dict], channels_by_id: Dict[PydanticObjectId, TVChannel]) -> str:
+    lines = []
+    for document in documents:
+        channel = channels_by_id.get(_channel_id(document))
+        lines.append(json.dumps({
+            "id": str(document["_id"]),
+            "title": document.get("title", ""),
+            "description": document.get("description", ""),
+            "start_time": document["start_time"].isoformat(),
+            "end_time": document["end_time"].isoformat(),
+            "channel": {
+                "id": str(_channel_id(document)),
+                "name": channel.name if channel else None,
+            },
+            "tags": document.get("tags"),
+        }, ensure_ascii=False) + "\n")
+    return "".join(lines)
+
+async def render_export(
+    export_format: str,
+    documents: AsyncIterator[dict],
+    channels: List[TVChannel],
+) -> AsyncIterator[bytes]:
+    """
+    Перетворює потік документів програм на потік байтів у вибраному форматі.
+    Назви каналів беруться з переданого списку, а не окремими запитами.
+    """
+    channels_by_id = {channel.id: channel for channel in channels}
+
+    if export_format == "xmltv":
+        yield xmltv.xmltv_header((str(channel.id), channel.name) for channel in channels).encode()
+    elif export_format == "csv":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(CSV_COLUMNS)
+        yield buffer.getvalue().encode()
+
+    def render(chunk: List[dict]) -> bytes:
+        if export_format == "xmltv":
+            return _xmltv_chunk(chunk).encode()
+        if export_format == "csv":
+            return _csv_chunk(chunk, channels_by_id).encode()
+        return _ndjson_chunk(chunk, channels_by_id).encode()
+
+    chunk: List[dict] = []
+    async for document in documents:
+        chunk.append(document)
+        if len(chunk) >= EXPORT_CHUNK_ROWS:
+            yield render(chunk)
+            chunk = []
+    if chunk:
+        yield render(chunk)
+
+    if export_format == "xmltv":
+        yield xmltv.XMLTV_FOOTER.encode()
+
+async def gzip_stream(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Стискає потік байтів у gzip на льоту."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
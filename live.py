@@ -0,0 +1,489 @@
+import asyncio
+import heapq
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from beanie import PydanticObjectId
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from pymongo.errors import OperationFailure, PyMongoError
+
+import crud
+from cache import channel_catalog
+from models import TVProgram
+from routes import encode_json
+
+# --- Налаштування ---
+LIVE_UPDATES = os.getenv("LIVE_UPDATES", "1").lower() in ("1", "true", "yes")
+# Скільки подій може чекати на одного підписника; повільний клієнт отримує "lagged" і відключається
+LIVE_SUBSCRIBER_QUEUE_SIZE = int(os.getenv("LIVE_SUBSCRIBER_QUEUE_SIZE", 100))
+LIVE_HEARTBEAT_SECONDS = float(os.getenv("LIVE_HEARTBEAT_SECONDS", 15))
+LIVE_WATCH_RETRY_SECONDS = float(os.getenv("LIVE_WATCH_RETRY_SECONDS", 5))
+# Затримка перерахунку "зараз / далі" після змін програм (масовий імпорт дає один перерахунок, а не тисячі)
+LIVE_REFRESH_DEBOUNCE_SECONDS = float(os.getenv("LIVE_REFRESH_DEBOUNCE_SECONDS", 0.5))
+# Найдовший сон таймера (захист від змін системного годинника)
+LIVE_TIMER_MAX_SLEEP_SECONDS = 60
+# Скільки вже отриманих змін обробляти разом (видалення пачки архівації перевіряються одним запитом)
+LIVE_CHANGE_BATCH_SIZE = int(os.getenv("LIVE_CHANGE_BATCH_SIZE", 500))
+# Просити в change stream стан програми до зміни (MongoDB 6.0+, pre-images колекції programs
+# вмикає `python manage.py migrate`). Без нього про перенесення на інший канал дізнаються всі підписники.
+LIVE_PRE_IMAGES = os.getenv("LIVE_PRE_IMAGES", "1").lower() in ("1", "true", "yes")
+
+# Коди помилок MongoDB: change streams доступні лише на replica set / шардованому кластері;
+# fullDocumentBeforeChange невідомий серверам до 6.0
+CHANGE_STREAM_NOT_SUPPORTED = 40573
+UNKNOWN_FIELD = 40415
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+# --- Події та підписники ---
+
+class LiveEvent:
+    """Подія, закодована один раз для всіх підписників (JSON для WebSocket і кадр SSE)."""
+
+    __slots__ = ("type", "payload", "sse")
+
+    def __init__(self, event_type: str, data: dict):
+        self.type = event_type
+        self.payload = encode_json({"type": event_type, **data})
+        self.sse = b"event: " + event_type.encode() + b"\ndata: " + self.payload + b"\n\n"
+
+LAGGED_EVENT = LiveEvent("lagged", {"detail": "Client is too slow, reconnect to resync"})
+
+class Subscriber:
+    """Одне підключення клієнта з обмеженою чергою подій."""
+
+    def __init__(self, channel_ids: Optional[Set[str]]):
+        self.channel_ids = channel_ids # None - усі канали
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=LIVE_SUBSCRIBER_QUEUE_SIZE)
+        self.lagged = False
+
+    def offer(self, event: LiveEvent) -> bool:
+        """Кладе подію в чергу без очікування. Повертає False, якщо клієнт не встигає."""
+        if self.lagged:
+            return False
+        try:
+            self.queue.put_nowait(event)
+            return True
+        except asyncio.QueueFull:
+            # Викидаємо накопичене і лишаємо лише "lagged", щоб клієнт перепідключився
+            self.lagged = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(LAGGED_EVENT)
+            return False
+
+class Broadcaster:
+    """
+    Розсилає події підписникам каналів у межах процесу.
+    Подія кодується один раз, а розсилка - лише put_nowait у черги, тож тисячі клієнтів
+    не сповільнюють джерело подій.
+    """
+
+    def __init__(self):
+        self._by_channel: Dict[str, Set[Subscriber]] = {}
+        self._all_channels: Set[Subscriber] = set()
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, channel_ids: Optional[Iterable[str]]) -> Subscriber:
+        subscriber = Subscriber(set(channel_ids) if channel_ids is not None else None)
+        if subscriber.channel_ids is None:
+            self._all_channels.add(subscriber)
+        else:
+            for channel_id in subscriber.channel_ids:
+                self._by_channel.setdefault(channel_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._all_channels.discard(subscriber)
+        for channel_id in subscriber.channel_ids or ():
+            subscribers = self._by_channel.get(channel_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._by_channel[channel_id]
+
+    def has_subscribers(self, channel_id: str) -> bool:
+        return bool(self._all_channels) or channel_id in self._by_channel
+
+    def _deliver(self, subscribers: Iterable[Subscriber], event: LiveEvent) -> None:
+        self.published += 1
+        for subscriber in subscribers:
+            if subscriber.offer(event):
+                self.delivered += 1
+            else:
+                self.dropped += 1
+
+    def publish(self, channel_id: str, event: LiveEvent) -> None:
+        """Надсилає подію підписникам каналу та підписникам усіх каналів."""
+        self._deliver(list(self._by_channel.get(channel_id, ())) + list(self._all_channels), event)
+
+    def publish_all(self, event: LiveEvent) -> None:
+        """Надсилає подію всім підписникам."""
+        subscribers = set(self._all_channels)
+        for channel_subscribers in self._by_channel.values():
+            subscribers.update(channel_subscribers)
+        self._deliver(subscribers, event)
+
+    def stats(self) -> dict:
+        subscribers = set(self._all_channels)
+        for channel_subscribers in self._by_channel.values():
+            subscribers.update(channel_subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "channels": len(self._by_channel),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+broadcaster = Broadcaster()
+
+# --- Таймер переходів "зараз / далі" ---
+
+class NowNextTimer:
+    """
+    Стежить за поточною та наступною програмою каналів, на які є підписники.
+    Найближчі межі програм лежать у купі (heapq); таймер спить до найближчої межі,
+    перераховує "зараз / далі" і надсилає подію now_next, лише якщо щось змінилося.
+    Застарілі записи купи не видаляються, а пропускаються за номером покоління.
+    """
+
+    def __init__(self, broadcaster: Broadcaster):
+        self.broadcaster = broadcaster
+        self._heap: List[Tuple[datetime, int, str]] = []
+        self._generation: Dict[str, int] = {}
+        self._due: Dict[str, datetime] = {}
+        self._state: Dict[str, LiveEvent] = {}
+        self._wakeup = asyncio.Event()
+        self.refreshes = 0
+
+    def _schedule(self, channel_id: str, at: datetime) -> None:
+        generation = self._generation.get(channel_id, 0) + 1
+        self._generation[channel_id] = generation
+        self._due[channel_id] = at
+        heapq.heappush(self._heap, (at, generation, channel_id))
+        if self._heap[0][2] == channel_id:
+            self._wakeup.set()
+
+    async def refresh(self, channel_id: str, publish: bool = True) -> None:
+        """Перераховує "зараз / далі" каналу, надсилає подію при зміні і планує наступну межу."""
+        self._due.pop(channel_id, None)
+        if not self.broadcaster.has_subscribers(channel_id):
+            # Нікому не потрібно - забуваємо стан, його перерахує перша підписка
+            self._state.pop(channel_id, None)
+            return
+
+        self.refreshes += 1
+        at = _utcnow()
+        now, upcoming = await crud.get_channel_now_next_documents(PydanticObjectId(channel_id), at)
+        event = LiveEvent("now_next", {"channel_id": channel_id, "now": now, "next": upcoming})
+        previous = self._state.get(channel_id)
+        self._state[channel_id] = event
+        if publish and (previous is None or previous.payload != event.payload):
+            self.broadcaster.publish(channel_id, event)
+
+        boundaries = [program["end_time"] for program in (now,) if program] + [program["start_time"] for program in (upcoming,) if program]
+        if boundaries:
+            self._schedule(channel_id, min(boundaries))
+
+    async def current(self, channel_id: str) -> LiveEvent:
+        """Поточний стан каналу (перераховується, якщо канал ще не відстежувався)."""
+        if channel_id not in self._state:
+            # Новий підписник отримає стан напряму, розсилати його всім не потрібно
+            await self.refresh(channel_id, publish=False)
+        return self._state[channel_id]
+
+    def touch(self, channel_id: str, end_time: Optional[datetime]) -> None:
+        """Програму каналу змінено - перерахувати "зараз / далі", якщо зміна не в минулому."""
+        if channel_id not in self._state:
+            return
+        if end_time is not None and end_time <= _utcnow():
+            return
+        at = _utcnow() + timedelta(seconds=LIVE_REFRESH_DEBOUNCE_SECONDS)
+        due = self._due.get(channel_id)
+        if due is None or due > at:
+            self._schedule(channel_id, at)
+
+    def touch_all(self) -> None:
+        """Змінено програму невідомого каналу - перерахувати всі відстежувані канали."""
+        for channel_id in list(self._state):
+            self.touch(channel_id, None)
+
+    async def run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            timeout = LIVE_TIMER_MAX_SLEEP_SECONDS
+            if self._heap:
+                timeout = min(timeout, max(0.0, (self._heap[0][0] - _utcnow()).total_seconds()))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+            now = _utcnow()
+            due_channels = set()
+            while self._heap and self._heap[0][0] <= now:
+                _, generation, channel_id = heapq.heappop(self._heap)
+                if self._generation.get(channel_id) == generation:
+                    due_channels.add(channel_id)
+            for channel_id in due_channels:
+                try:
+                    await self.refresh(channel_id)
+                except Exception as e:
+                    print(f"Не вдалося оновити 'зараз / далі' каналу {channel_id}: {e}")
+                    self._schedule(channel_id, _utcnow() + timedelta(seconds=LIVE_WATCH_RETRY_SECONDS))
+
+    def stats(self) -> dict:
+        return {"tracked_channels": len(self._state), "pending_timers": len(self._due), "refreshes": self.refreshes}
+
+now_next_timer = NowNextTimer(broadcaster)
+
+# --- Change stream програм ---
+
+CHANGE_EVENT_TYPES = {"insert": "program.created", "update": "program.updated", "replace": "program.updated", "delete": "program.deleted"}
+
+def _may_change_channel(change: dict) -> bool:
+    """Чи могла зміна перенести програму на інший канал (replace - повний запис, канал міг змінитися)."""
+    if change["operationType"] == "replace":
+        return True
+    updated_fields = change.get("updateDescription", {}).get("updatedFields", {})
+    return any(field == "channel" or field.startswith("channel.") for field in updated_fields)
+
+def _publish_removal(program_id, channel_id: Optional[str], end_time: Optional[datetime]) -> None:
+    """Повідомляє, що програми більше немає в каналі (якщо канал невідомий - усім підписникам)."""
+    event = LiveEvent("program.deleted", {"id": program_id})
+    if channel_id is None:
+        # Подія маленька і рідкісна, тож розіслати всім дешевше, ніж шукати канал
+        broadcaster.publish_all(event)
+        now_next_timer.touch_all()
+    else:
+        broadcaster.publish(channel_id, event)
+        now_next_timer.touch(channel_id, end_time)
+
+async def handle_program_change(change: dict, archived: bool = False) -> None:
+    """
+    Перетворює подію change stream на дельту для підписників каналу.
+    archived - видалену програму перенесено в архів (див. handle_program_changes).
+    """
+    event_type = CHANGE_EVENT_TYPES.get(change["operationType"])
+    if event_type is None:
+        return
+    program_id = change["documentKey"]["_id"]
+
+    document = change.get("fullDocument")
+    # Стан до зміни є, лише якщо для колекції ввімкнено pre-images
+    before = change.get("fullDocumentBeforeChange")
+    previous_channel_id = str(before["channel"].id) if before and before.get("channel") else None
+    previous_end_time = before.get("end_time") if before else None
+
+    if event_type == "program.deleted" and archived:
+        # Програму перенесено в архів - вона давно вийшла в ефір, клієнтам повідомляти нічого
+        return
+    if event_type == "program.deleted" or document is None:
+        _publish_removal(program_id, previous_channel_id, previous_end_time)
+        return
+
+    channel_id = str(document["channel"].id)
+    if previous_channel_id is not None:
+        if previous_channel_id != channel_id:
+            # Програму перенесено на інший канал - підписники старого мають її прибрати
+            _publish_removal(program_id, previous_channel_id, previous_end_time)
+    elif event_type == "program.updated" and _may_change_channel(change):
+        _publish_removal(program_id, None, None)
+
+    program = (await crud.program_documents_to_dicts([document]))[0]
+    broadcaster.publish(channel_id, LiveEvent(event_type, {"channel_id": channel_id, "program": program}))
+    now_next_timer.touch(channel_id, document.get("end_time"))
+
+async def handle_program_changes(changes: List[dict]) -> None:
+    """Обробляє пачку подій change stream; видалення перевіряються на архівацію одним запитом."""
+    deleted_ids = [change["documentKey"]["_id"] for change in changes if change["operationType"] == "delete"]
+    try:
+        archived = await crud.archived_program_ids(deleted_ids)
+    except PyMongoError as e:
+        # Краще зайве повідомлення про видалення, ніж пропущене
+        print(f"Не вдалося перевірити архів для видалених програм: {e}")
+        archived = set()
+    for change in changes:
+        try:
+            await handle_program_change(change, archived=change["documentKey"]["_id"] in archived)
+        except Exception as e:
+            print(f"Не вдалося обробити зміну програми: {e}")
+
+async def watch_programs() -> None:
+    """
+    Один спостерігач change stream колекції програм на воркер.
+    Після збою перепідключається з останнього resume token, щоб не пропустити зміни.
+    """
+    resume_token = None
+    pre_images = LIVE_PRE_IMAGES
+    while True:
+        try:
+            options = {"full_document_before_change": "whenAvailable"} if pre_images else {}
+            async with TVProgram.get_motor_collection().watch(
+                [{"$match": {"operationType": {"$in": list(CHANGE_EVENT_TYPES)}}}],
+                full_document="updateLookup",
+                resume_after=resume_token,
+                **options,
+            ) as stream:
+                print("Change stream програм запущено.")
+                async for change in stream:
+                    changes = [change]
+                    # Зміни, що вже надійшли (наприклад, пачка архівації), обробляються разом
+                    while len(changes) < LIVE_CHANGE_BATCH_SIZE:
+                        next_change = await stream.try_next()
+                        if next_change is None:
+                            break
+                        changes.append(next_change)
+                    resume_token = stream.resume_token
+                    await handle_program_changes(changes)
+        except asyncio.CancelledError:
+            raise
+        except OperationFailure as e:
+            if e.code == CHANGE_STREAM_NOT_SUPPORTED:
+                print("Change streams недоступні (потрібен replica set) - дельти програм не надсилатимуться.")
+                return
+            if e.code == UNKNOWN_FIELD and pre_images:
+                print("Сервер не підтримує стан документа до зміни - переміщення програм між каналами повідомлятимуться всім.")
+                pre_images = False
+                continue
+            print(f"Change stream програм перервано: {e}. Повтор через {LIVE_WATCH_RETRY_SECONDS} с.")
+            await asyncio.sleep(LIVE_WATCH_RETRY_SECONDS)
+        except PyMongoError as e:
+            print(f"Change stream програм перервано: {e}. Повтор через {LIVE_WATCH_RETRY_SECONDS} с.")
+            await asyncio.sleep(LIVE_WATCH_RETRY_SECONDS)
+
+# --- Запуск і зупинка фонових задач ---
+
+_tasks: List[asyncio.Task] = []
+
+def start_live_updates() -> None:
+    """Запускає спостерігач change stream і таймер "зараз / далі" (викликається при старті застосунку)."""
+    if not LIVE_UPDATES or _tasks:
+        return
+    _tasks.append(asyncio.create_task(watch_programs()))
+    _tasks.append(asyncio.create_task(now_next_timer.run()))
+
+async def stop_live_updates() -> None:
+    """Зупиняє фонові задачі живих оновлень."""
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+
+# --- Маршрути ---
+live_router = APIRouter(
+    prefix="/live",
+    tags=["Live"]
+)
+
+async def _subscribe(channel_ids: Optional[List[PydanticObjectId]]) -> Tuple[Subscriber, List[str]]:
+    """Підписує клієнта і кладе в його чергу поточний стан "зараз / далі" кожного каналу."""
+    if channel_ids:
+        channels = await channel_catalog.get_many(channel_ids)
+        if len(channels) != len(set(channel_ids)):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Channel not found")
+        watched = [str(channel_id) for channel_id in channels]
+        subscriber = broadcaster.subscribe(watched)
+    else:
+        watched = [str(channel.id) for channel in await channel_catalog.all()]
+        subscriber = broadcaster.subscribe(None)
+    try:
+        for channel_id in watched:
+            subscriber.offer(await now_next_timer.current(channel_id))
+    except Exception:
+        broadcaster.unsubscribe(subscriber)
+        raise
+    return subscriber, watched
+
+async def _sse_stream(subscriber: Subscriber):
+    while True:
+        try:
+            event = await asyncio.wait_for(subscriber.queue.get(), LIVE_HEARTBEAT_SECONDS)
+        except asyncio.TimeoutError:
+            # Коментар SSE тримає з'єднання живим крізь проксі
+            yield b": heartbeat\n\n"
+            continue
+        yield event.sse
+        if event is LAGGED_EVENT:
+            return
+
+class LiveEventsResponse(StreamingResponse):
+    """
+    SSE-відповідь, що відписує клієнта, хоч би як вона завершилася. finally в генераторі
+    не виконається, якщо клієнт відключився ще до першого кадру і генератор так і не почали читати.
+    """
+
+    def __init__(self, subscriber: Subscriber):
+        super().__init__(
+            _sse_stream(subscriber),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+        self.subscriber = subscriber
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            broadcaster.unsubscribe(self.subscriber)
+
+@live_router.get("/events")
+async def live_events_endpoint(channel_ids: Optional[List[PydanticObjectId]] = Query(None)):
+    """
+    Server-Sent Events: поточні "зараз / далі" вибраних каналів (або всіх),
+    далі - переходи програм і зміни розкладу в реальному часі.
+    """
+    subscriber, _ = await _subscribe(channel_ids)
+    return LiveEventsResponse(subscriber)
+
+@live_router.websocket("/ws")
+async def live_websocket_endpoint(websocket: WebSocket, channel_ids: Optional[List[PydanticObjectId]] = Query(None)):
+    """Те саме, що /live/events, але через WebSocket (кожна подія - JSON-повідомлення)."""
+    try:
+        subscriber, _ = await _subscribe(channel_ids)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    await websocket.accept()
+
+    async def send_events() -> None:
+        while True:
+            event = await subscriber.queue.get()
+            await websocket.send_text(event.payload.decode())
+            if event is LAGGED_EVENT:
+                return
+
+    async def wait_disconnect() -> None:
+        # Повідомлення від клієнта не очікуються - лише чекаємо на відключення
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    sender = asyncio.create_task(send_events())
+    receiver = asyncio.create_task(wait_disconnect())
+    try:
+        await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        disconnected = receiver.done()
+    finally:
+        for task in (sender, receiver):
+            task.cancel()
+        await asyncio.gather(sender, receiver, return_exceptions=True)
+        broadcaster.unsubscribe(subscriber)
+    if not disconnected:
+        # Клієнт відстав - закриваємо з'єднання, щоб він перепідключився
+        try:
+            await websocket.close()
+        except (RuntimeError, WebSocketDisconnect):
+            pass
+
+@live_router.get("/stats")
+async def live_stats_endpoint():
+    """Кількість підписників і лічильники розсилки цього воркера."""
+    return {"broadcaster": broadcaster.stats(), "now_next_timer": now_next_timer.stats()}
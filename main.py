@@ -1,10 +1,33 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 # Імпортуємо роутери
-from routes import auth_router, app_router
-from database import init_db_connection
+from routes import auth_router, app_router, health_router
+from database import init_db_connection, close_db_connection
+from metrics import MetricsMiddleware
+from compression import CompressionMiddleware
+from live import live_router, start_live_updates, stop_live_updates
+from archive import start_archiver, stop_archiver
 
-app = FastAPI()
+# --- Життєвий цикл застосунку: підключення до MongoDB при старті і закриття при зупинці ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ініціалізує підключення до MongoDB та Beanie і запускає живі оновлення та архівацію при старті FastAPI,
+    зупиняє їх і закриває клієнта при зупинці.
+    """
+    await init_db_connection()
+    # Один спостерігач change stream і таймер "зараз / далі" на воркер
+    start_live_updates()
+    start_archiver()
+    try:
+        yield
+    finally:
+        await stop_archiver()
+        await stop_live_updates()
+        close_db_connection()
+
+app = FastAPI(lifespan=lifespan)
 
 # --- CORS Middleware ---
 origins = [
@@ -19,18 +42,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# --- Реєструємо подію startup для ініціалізації Beanie ---
-@app.on_event("startup")
-async def startup_db_client():
-    """
-    Асинхронна функція, що викликається при старті FastAPI.
-    Ініціалізує підключення до MongoDB.
-    """
-    await init_db_connection()
+# --- Стиснення відповідей gzip / brotli за Accept-Encoding ---
+app.add_middleware(CompressionMiddleware)
+
+# --- Метрики запитів (додається останнім, щоб вимірювати весь стек middleware) ---
+app.add_middleware(MetricsMiddleware)
 
 # --- Включаємо роутери ---
 app.include_router(auth_router)
 app.include_router(app_router)
+app.include_router(health_router)
+app.include_router(live_router)
 
 @app.get("/")
 def root():
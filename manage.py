@@ -0,0 +1,69 @@
+"""
+Службові команди для бази даних.
+
+Використання:
+    python manage.py migrate              # створити/оновити індекси всіх колекцій, увімкнути pre-images programs
+    python manage.py seed                 # додати початкові канали
+    python manage.py backfill-snapshots   # записати знімки каналів в усі програми
+    python manage.py check-snapshots      # звіт про розбіжності знімків каналів
+    python manage.py rebuild-days         # перебудувати розклади каналів на добу (channel_days)
+    python manage.py archive              # перенести програми, що вийшли в ефір, у programs_archive
+"""
+import argparse
+import asyncio
+import json
+
+import crud
+from database import init_db_connection, close_db_connection, enable_program_pre_images, seed_channels, sync_indexes
+
+async def migrate() -> None:
+    for collection, indexes in (await sync_indexes()).items():
+        print(f"{collection}: {', '.join(indexes)}")
+    print("Індекси синхронізовано.")
+    if await enable_program_pre_images():
+        print("Стан програм до зміни для change stream ввімкнено.")
+
+async def seed() -> None:
+    await seed_channels()
+
+async def backfill_snapshots() -> None:
+    updated = await crud.backfill_channel_snapshots()
+    print(f"Знімки каналів записано в {updated} програм.")
+
+async def check_snapshots() -> None:
+    report = await crud.check_channel_snapshots()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+async def rebuild_days() -> None:
+    written = await crud.rebuild_channel_days()
+    print(f"Перебудовано {written} діб розкладу каналів.")
+
+async def archive() -> None:
+    archived = await crud.archive_aired_programs()
+    print(f"Архівовано {archived} програм (закінчилися до {crud.archive_cutoff():%Y-%m-%d %H:%M} UTC).")
+
+COMMANDS = {
+    "migrate": migrate,
+    "seed": seed,
+    "backfill-snapshots": backfill_snapshots,
+    "check-snapshots": check_snapshots,
+    "rebuild-days": rebuild_days,
+    "archive": archive,
+}
+
+async def run(command: str) -> None:
+    # Індекси синхронізує лише migrate, початкові дані додає лише seed
+    await init_db_connection(fast_start=False, sync_indexes=False, seed=False)
+    try:
+        await COMMANDS[command]()
+    finally:
+        close_db_connection()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Службові команди API телепрограми")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    asyncio.run(run(args.command))
+
+if __name__ == "__main__":
+    main()
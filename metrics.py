@@ -0,0 +1,222 @@
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+# Додавати заголовок Server-Timing з розкладом часу запиту (лише для налагодження)
+DEBUG = os.getenv("DEBUG", "0").lower() in ("1", "true", "yes")
+
+# Межі кошиків гістограм
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_COMMAND_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+# --- Метрики поточного запиту ---
+
+class RequestMetrics:
+    """
+    Лічильники одного HTTP-запиту: команди MongoDB, час у базі, bcrypt та серіалізації.
+    Події PyMongo приходять з потоків Motor, тому оновлення захищені блокуванням.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.db_commands = 0
+        self.timings: Dict[str, float] = {}
+
+    def add_db_command(self, seconds: float) -> None:
+        with self._lock:
+            self.db_commands += 1
+            self.timings["db"] = self.timings.get("db", 0.0) + seconds
+
+    def add_timing(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def server_timing(self) -> str:
+        """Значення заголовка Server-Timing (тривалості в мілісекундах)."""
+        with self._lock:
+            parts = [f"total;dur={(time.perf_counter() - self.started) * 1000:.2f}"]
+            for name, seconds in sorted(self.timings.items()):
+                entry = f"{name};dur={seconds * 1000:.2f}"
+                if name == "db":
+                    entry += f';desc="{self.db_commands} commands"'
+                parts.append(entry)
+        return ", ".join(parts)
+
+# Motor виконує операції PyMongo в пулі потоків з копією контексту, тож слухач команд бачить метрики свого запиту
+_current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request_metrics", default=None)
+
+def record_timing(name: str, seconds: float) -> None:
+    """Додає час до метрик поточного запиту (поза запитом нічого не робить)."""
+    request = _current_request.get()
+    if request is not None:
+        request.add_timing(name, seconds)
+
+# --- Реєстр метрик процесу ---
+
+class Histogram:
+    """Кумулятивна гістограма у форматі Prometheus."""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+class MetricsRegistry:
+    """Лічильники та гістограми HTTP-маршрутів і команд MongoDB."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str, str], int] = {}
+        self.latency: Dict[Tuple[str, str], Histogram] = {}
+        self.db_commands: Dict[Tuple[str, str], Histogram] = {}
+        self.db_time: Dict[Tuple[str, str], Histogram] = {}
+        self.hash_time: Dict[Tuple[str, str], float] = {}
+        self.mongo_commands: Dict[str, int] = {}
+        self.mongo_failures: Dict[str, int] = {}
+        self.mongo_time: Dict[str, float] = {}
+
+    def observe_request(self, method: str, route: str, status_code: int, seconds: float, request: RequestMetrics) -> None:
+        key = (method, route)
+        with self._lock:
+            status_key = (method, route, str(status_code))
+            self.requests[status_key] = self.requests.get(status_key, 0) + 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.db_commands.setdefault(key, Histogram(DB_COMMAND_BUCKETS)).observe(request.db_commands)
+            self.db_time.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(request.timings.get("db", 0.0))
+            if "hash" in request.timings:
+                self.hash_time[key] = self.hash_time.get(key, 0.0) + request.timings["hash"]
+
+    def observe_command(self, command: str, seconds: float, failed: bool) -> None:
+        with self._lock:
+            self.mongo_commands[command] = self.mongo_commands.get(command, 0) + 1
+            self.mongo_time[command] = self.mongo_time.get(command, 0.0) + seconds
+            if failed:
+                self.mongo_failures[command] = self.mongo_failures.get(command, 0) + 1
+
+    def render(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """Усі метрики в текстовому форматі Prometheus."""
+        lines: List[str] = []
+        with self._lock:
+            _counter(lines, "http_requests_total", "HTTP requests by route and status",
+                     {_labels(method=m, route=r, status=s): v for (m, r, s), v in self.requests.items()})
+            _histograms(lines, "http_request_duration_seconds", "HTTP request latency", self.latency)
+            _histograms(lines, "http_request_db_commands", "MongoDB commands issued per HTTP request", self.db_commands)
+            _histograms(lines, "http_request_db_duration_seconds", "Time spent in MongoDB per HTTP request", self.db_time)
+            _counter(lines, "http_request_password_hash_seconds_total", "Time spent in bcrypt by route",
+                     {_labels(method=m, route=r): v for (m, r), v in self.hash_time.items()})
+            _counter(lines, "mongodb_commands_total", "MongoDB commands by name",
+                     {_labels(command=c): v for c, v in self.mongo_commands.items()})
+            _counter(lines, "mongodb_command_failures_total", "Failed MongoDB commands by name",
+                     {_labels(command=c): v for c, v in self.mongo_failures.items()})
+            _counter(lines, "mongodb_command_duration_seconds_total", "Time spent in MongoDB commands by name",
+                     {_labels(command=c): v for c, v in self.mongo_time.items()})
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+def _counter(lines: List[str], name: str, help_text: str, values: Dict[str, float]) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for labels, value in sorted(values.items()):
+        lines.append(f"{name}{{{labels}}} {value}")
+
+def _histograms(lines: List[str], name: str, help_text: str, histograms: Dict[Tuple[str, str], Histogram]) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), histogram in sorted(histograms.items()):
+        labels = _labels(method=method, route=route)
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+        lines.append(f"{name}_sum{{{labels}}} {histogram.total}")
+        lines.append(f"{name}_count{{{labels}}} {histogram.count}")
+
+registry = MetricsRegistry()
+
+# --- Слухач команд MongoDB ---
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Рахує команди MongoDB та їхню тривалість - загалом і для поточного HTTP-запиту."""
+
+    def started(self, event):
+        pass
+
+    def _finished(self, event, failed: bool) -> None:
+        seconds = event.duration_micros / 1_000_000
+        registry.observe_command(event.command_name, seconds, failed)
+        request = _current_request.get()
+        if request is not None:
+            request.add_db_command(seconds)
+
+    def succeeded(self, event):
+        self._finished(event, failed=False)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
+
+command_metrics = CommandMetricsListener()
+
+# --- ASGI middleware ---
+
+class MetricsMiddleware:
+    """
+    Чистий ASGI middleware: вимірює тривалість кожного HTTP-запиту і записує її
+    в гістограму маршруту (шаблон шляху, а не сам шлях, щоб не роздувати кількість міток).
+    У режимі DEBUG додає до відповіді заголовок Server-Timing.
+    """
+
+    def __init__(self, app, server_timing: bool = DEBUG):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = RequestMetrics()
+        token = _current_request.set(request)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", request.server_timing().encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_request.reset(token)
+            route = scope.get("route")
+            registry.observe_request(
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status_code,
+                time.perf_counter() - request.started,
+                request,
+            )
@@ -1,8 +1,8 @@
 from datetime import datetime
 from typing import Optional, List
-from beanie import Document, Link, Indexed 
-from pydantic import Field
-from pymongo import IndexModel, ASCENDING
+from beanie import Document, Link, Indexed, PydanticObjectId
+from pydantic import BaseModel, Field
+from pymongo import IndexModel, ASCENDING, TEXT
 
 # --- Модель Каналу ---
 class TVChannel(Document):
@@ -21,6 +21,12 @@ class User(Document):
     class Settings:
         name = "users"
 
+# --- Знімок каналу всередині програми (денормалізація) ---
+class ChannelSnapshot(BaseModel):
+    id: PydanticObjectId
+    name: str
+    country: str
+
 # --- Модель Програми ---
 class TVProgram(Document):
     title: str 
@@ -29,10 +35,61 @@ class TVProgram(Document):
     end_time: datetime
     channel: Link[TVChannel]
     tags: Optional[List[str]] = None
+    # Копія даних каналу, щоб читати програми без join (див. PROGRAM_CHANNEL_SNAPSHOTS у crud)
+    channel_snapshot: Optional[ChannelSnapshot] = None
+    revision: int = Field(default=0) # Збільшується при кожній зміні (для оптимістичних блокувань)
 
     class Settings:
         name = "programs"
         indexes = [
             IndexModel([("title", ASCENDING)], name="title_asc_index"),
             IndexModel([("start_time", ASCENDING)], name="start_time_asc_index"),
-        ]
\ No newline at end of file
+            IndexModel([("start_time", ASCENDING), ("_id", ASCENDING)], name="start_time_id_asc_index"),
+            # Для сітки мовлення: рівність по каналу + діапазон по часу
+            IndexModel(
+                [("channel.$id", ASCENDING), ("start_time", ASCENDING), ("end_time", ASCENDING)],
+                name="channel_start_end_index",
+            ),
+            # Повнотекстовий пошук: назва важить більше за опис
+            IndexModel(
+                [("title", TEXT), ("description", TEXT)],
+                weights={"title": 10, "description": 2},
+                name="title_description_text_index",
+            ),
+            IndexModel([("tags", ASCENDING)], name="tags_asc_index"),
+        ]
+# --- Архів програм, що вже вийшли в ефір (холодне сховище) ---
+class ArchivedTVProgram(TVProgram):
+    """
+    Програма, перенесена з programs фоновою архівацією (див. crud.archive_aired_programs).
+    Документи мають ту саму форму; індекси - лише для читання за вікном часу і експорту.
+    """
+
+    class Settings:
+        name = "programs_archive"
+        indexes = [
+            IndexModel([("start_time", ASCENDING), ("_id", ASCENDING)], name="start_time_id_asc_index"),
+            IndexModel(
+                [("channel.$id", ASCENDING), ("start_time", ASCENDING), ("end_time", ASCENDING)],
+                name="channel_start_end_index",
+            ),
+        ]
+
+# --- Матеріалізований розклад каналу на добу ---
+class ChannelDay(Document):
+    channel_id: PydanticObjectId
+    date: str # Доба в UTC у форматі "YYYY-MM-DD"
+    # Впорядковані за start_time програми у форматі TVProgramResponseBase (див. crud.channel_day_entry)
+    programs: List[dict] = []
+    # Лічильник записів у добу: побудова доби зберігається, лише якщо він не змінився
+    version: int = 0
+    # Добу створив запис програми, а не побудова - programs може бути неповним
+    pending: bool = False
+
+    class Settings:
+        name = "channel_days"
+        indexes = [
+            IndexModel([("channel_id", ASCENDING), ("date", ASCENDING)], unique=True, name="channel_date_unique_index"),
+            # Для видалення програми з усіх діб, де вона є
+            IndexModel([("programs.id", ASCENDING)], name="programs_id_index"),
+        ]
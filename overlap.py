@@ -0,0 +1,113 @@
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from itertools import accumulate
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Політики для програм, що перетинаються з іншими програмами каналу
+OVERLAP_REJECT = "reject" # відхилити запис
+OVERLAP_WARN = "warn" # записати як є і повідомити
+OVERLAP_TRIM = "trim" # обрізати нову програму до вільного проміжку (якщо він лишається)
+OVERLAP_POLICIES = (OVERLAP_REJECT, OVERLAP_WARN, OVERLAP_TRIM)
+
+# Скільки конфліктних програм повідомляти для одного запису
+OVERLAP_MAX_REPORTED_CONFLICTS = 5
+
+Interval = Tuple[datetime, datetime, Any] # (початок, кінець, ID програми)
+
+def trim_interval(start: datetime, end: datetime, conflicts: Iterable[Tuple[datetime, datetime]]) -> Optional[Tuple[datetime, datetime]]:
+    """
+    Обрізає проміжок [start, end) так, щоб він не перетинав жодного з conflicts (відсортованих за початком):
+    початок зсувається за кінець програм, що почалися раніше, кінець - до початку наступної програми.
+    Повертає None, якщо вільного проміжку не лишилося.
+    """
+    for conflict_start, conflict_end in conflicts:
+        if conflict_start <= start:
+            start = max(start, conflict_end)
+        else:
+            end = min(end, conflict_start)
+            break
+    return (start, end) if start < end else None
+
+class ChannelIntervalIndex:
+    """
+    Індекс проміжків програм одного каналу для пакетної перевірки перетинів.
+    Проміжки відсортовані за початком, поруч - префіксний максимум кінців, тож і перевірка,
+    і обрізання - це двійковий пошук (bisect) за O(log n), навіть якщо в базі вже є перетини.
+    """
+
+    def __init__(self, intervals: Iterable[Interval]):
+        ordered = sorted(intervals, key=lambda interval: interval[0])
+        self._starts = [interval[0] for interval in ordered]
+        self._ends = [interval[1] for interval in ordered]
+        self._ids = [interval[2] for interval in ordered]
+        self._max_end = list(accumulate(self._ends, max))
+
+    def conflicts(self, start: datetime, end: datetime, limit: int = OVERLAP_MAX_REPORTED_CONFLICTS) -> List[Any]:
+        """ID програм індексу, що перетинають [start, end) (не більше limit)."""
+        i = bisect_left(self._starts, end)
+        result = []
+        # Кандидати - програми, що почалися до end; далі назад, доки хоч одна з них закінчується після start
+        j = i - 1
+        while j >= 0 and self._max_end[j] > start and len(result) < limit:
+            if self._ends[j] > start:
+                result.append(self._ids[j])
+            j -= 1
+        return result
+
+    def trim(self, start: datetime, end: datetime) -> Optional[Tuple[datetime, datetime]]:
+        """Обрізає [start, end) до вільного від програм індексу проміжку (None, якщо такого немає)."""
+        k = bisect_right(self._starts, start)
+        while k and self._max_end[k - 1] > start:
+            start = self._max_end[k - 1]
+            k = bisect_right(self._starts, start)
+        if k < len(self._starts):
+            end = min(end, self._starts[k])
+        return (start, end) if start < end else None
+
+class OverlapDecision(NamedTuple):
+    accepted: bool
+    start: datetime
+    end: datetime
+    conflicts: List[Any] # ID програм (з бази) або номери рядків пакета, з якими є перетин
+    trimmed: bool = False
+
+def validate_channel_batch(
+    rows: Iterable[Tuple[int, datetime, datetime]],
+    existing: ChannelIntervalIndex,
+    policy: str,
+) -> Dict[int, OverlapDecision]:
+    """
+    Перевіряє нові програми одного каналу (номер рядка, початок, кінець) на перетини
+    з уже наявними програмами та між собою.
+
+    Рядки обробляються за зростанням початку, тож серед нових програм перевага в тієї, що починається раніше,
+    а для порівняння з уже прийнятими новими програмами достатньо пам'ятати найпізніший кінець.
+    Разом із побудовою індексу це O(n log n) на канал.
+    """
+    decisions: Dict[int, OverlapDecision] = {}
+    accepted_end: Optional[datetime] = None
+    accepted_row: Optional[int] = None
+
+    for row, start, end in sorted(rows, key=lambda item: (item[1], item[0])):
+        conflicts = existing.conflicts(start, end)
+        if accepted_end is not None and accepted_end > start:
+            conflicts.append(accepted_row)
+        if not conflicts:
+            decision = OverlapDecision(True, start, end, [])
+        elif policy == OVERLAP_WARN:
+            decision = OverlapDecision(True, start, end, conflicts)
+        elif policy == OVERLAP_TRIM:
+            # Початок не раніше за кінець уже прийнятих нових програм, решту обрізає індекс наявних
+            trimmed = existing.trim(max(start, accepted_end) if accepted_end is not None else start, end)
+            if trimmed is None:
+                decision = OverlapDecision(False, start, end, conflicts)
+            else:
+                decision = OverlapDecision(True, trimmed[0], trimmed[1], conflicts, trimmed=True)
+        else:
+            decision = OverlapDecision(False, start, end, conflicts)
+
+        decisions[row] = decision
+        if decision.accepted and (accepted_end is None or decision.end > accepted_end):
+            accepted_end = decision.end
+            accepted_row = row
+    return decisions
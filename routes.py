@@ -1,12 +1,28 @@
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, File, Header, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 import crud
 import schemas
-from models import User, TVProgram, TVChannel 
+from models import User
 from beanie import PydanticObjectId
+from pymongo.errors import DuplicateKeyError
 import security
-from typing import List
+import database
+import metrics
+import compression
+from archive import archiver
+from cache import channel_catalog, current_versions, principal_cache, response_cache, response_etag, response_flights
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from pydantic import TypeAdapter
+import json
+import time
+
+try:
+    import orjson # Необов'язкова залежність: швидший JSON-енкодер
+except ImportError:
+    orjson = None
 
 # --- Налаштування OAuth2 ---
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
@@ -23,12 +39,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    username = security.verify_token(token, credentials_exception)
-    if username is None:
-         raise credentials_exception
-    user = await crud.get_user_by_username(username=username)
+    # Токен уже перевірявся нещодавно - беремо користувача з кешу без декодування та запиту до Mongo
+    user = principal_cache.get(token)
+    if user is not None:
+        return user
+
+    payload = security.decode_token(token, credentials_exception)
+    user = await crud.get_user_by_username(username=payload["sub"])
     if user is None:
         raise credentials_exception
+    principal_cache.put(token, user, token_expires_at=payload.get("exp"))
     return user
 
 # --- Залежність для перевірки адміна ---
@@ -43,12 +63,137 @@ async def get_current_active_admin_user(current_user: User = Depends(get_current
         )
     return current_user
 
+# --- Кеш відповідей та умовні GET-запити ---
+
+_type_adapters: Dict[Any, TypeAdapter] = {}
+
+def render_json(response_type: Any, data: Any) -> bytes:
+    """Валідує дані за схемою відповіді та серіалізує їх у JSON (так само, як response_model)."""
+    started = time.perf_counter()
+    adapter = _type_adapters.get(response_type)
+    if adapter is None:
+        adapter = _type_adapters[response_type] = TypeAdapter(response_type)
+    body = adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+    metrics.record_timing("serialize", time.perf_counter() - started)
+    return body
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value) # ObjectId та інші прості типи
+
+def encode_json(data: Any) -> bytes:
+    """
+    Серіалізує вже підготовлені словники (швидкий шлях читання) одразу в JSON-байти,
+    без повторної валідації через Pydantic.
+    """
+    started = time.perf_counter()
+    if orjson is not None:
+        body = orjson.dumps(data, default=str)
+    else:
+        body = json.dumps(data, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode()
+    metrics.record_timing("serialize", time.perf_counter() - started)
+    return body
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Перевіряє заголовок If-None-Match (слабке порівняння, як вимагає RFC 9110)."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+async def cached_json_response(
+    request: Request,
+    collections: Tuple[str, ...],
+    produce: Callable[[], Awaitable[Union[bytes, Tuple[bytes, str]]]],
+) -> Response:
+    """
+    Віддає JSON-відповідь з кешу (ключ - шлях і параметри запиту) разом з ETag.
+    Якщо ETag клієнта збігається, відповідає 304 без звернення до Mongo.
+    Однакові запити, що прийшли, поки відповідь обчислюється, чекають на те саме обчислення.
+    produce може повернути (тіло, префікс ETag) - так ETag програми починається з її ревізії.
+    """
+    key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    # Версії беремо до обчислення: якщо під час нього був запис, запис кешу одразу застаріє
+    versions = current_versions(collections)
+    entry = response_cache.get(key, versions)
+    if entry is None:
+        async def produce_entry():
+            result = await produce()
+            body, etag_prefix = result if isinstance(result, tuple) else (result, "")
+            return response_cache.put(key, body, versions, etag_prefix=etag_prefix)
+
+        # Версії входять у ключ: запити після запису не отримають результат, обчислений до нього
+        entry = await response_flights.do((key, versions), produce_entry)
+
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+# --- Вибір полів відповіді (параметр fields=) ---
+
+# Поле відповіді -> дозволені вкладені поля (None - поле без вкладених)
+PROGRAM_RESPONSE_FIELDS = {field: crud.CHANNEL_FIELDS if field == "channel" else None for field in crud.PROGRAM_FIELD_SOURCES}
+CHANNEL_RESPONSE_FIELDS = {field: None for field in crud.CHANNEL_FIELDS}
+CHANNEL_WITH_PROGRAMS_RESPONSE_FIELDS = {**CHANNEL_RESPONSE_FIELDS, "programs": tuple(crud.PROGRAM_FIELD_SOURCES)}
+
+# Вибрані поля: поле -> вибрані вкладені поля (None - усі вкладені)
+FieldSelection = Dict[str, Optional[set]]
+
+def parse_fields(fields: Optional[str], allowed: Dict[str, Optional[Tuple[str, ...]]]) -> Optional[FieldSelection]:
+    """
+    Розбирає fields=id,title,channel.name. Повертає None, якщо параметр не задано (усі поля).
+    Невідоме поле - помилка 400.
+    """
+    if fields is None:
+        return None
+    selection: FieldSelection = {}
+    for name in filter(None, (part.strip() for part in fields.split(","))):
+        head, _, nested = name.partition(".")
+        if head not in allowed or (nested and nested not in (allowed[head] or ())):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown field: {name}")
+        if not nested:
+            selection[head] = None
+        elif selection.get(head, set()) is not None:
+            selection.setdefault(head, set()).add(nested)
+    if not selection:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="fields must not be empty")
+    return selection
+
+def select_fields(data: dict, selection: Optional[FieldSelection]) -> dict:
+    """Лишає у словнику відповіді лише вибрані поля (вкладені словники та списки словників теж)."""
+    if selection is None:
+        return data
+    result = {}
+    for key, value in data.items():
+        if key not in selection:
+            continue
+        nested = selection[key]
+        if nested is not None and isinstance(value, list):
+            value = [{k: v for k, v in item.items() if k in nested} for item in value]
+        elif nested is not None and isinstance(value, dict):
+            value = {k: v for k, v in value.items() if k in nested}
+        result[key] = value
+    return result
+
+def _program_projection(selection: Optional[FieldSelection]) -> Optional[dict]:
+    return crud.program_projection(selection) if selection is not None else None
+
 # --- Роутер для автентифікації ---
 auth_router = APIRouter(
     prefix="/auth",
     tags=["Authentication"]
 )
 
+def _hashing_busy_exception() -> HTTPException:
+    """Відповідь, коли черга на хешування паролів переповнена."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many authentication requests, try again later",
+        headers={"Retry-After": "1"},
+    )
+
 @auth_router.post("/register", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
 async def register_user(user_in: schemas.UserCreate): 
     """Реєструє нового користувача."""
@@ -59,14 +204,21 @@ async def register_user(user_in: schemas.UserCreate):
             detail="Username already registered"
         )
     # Викликаємо async create_user
-    created_user = await crud.create_user(user_data=user_in)
+    try:
+        created_user = await crud.create_user(user_data=user_in)
+    except security.PasswordHashQueueFull:
+        raise _hashing_busy_exception()
     return created_user
 
 @auth_router.post("/token", response_model=schemas.Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()): 
     """Автентифікує користувача та повертає JWT токен."""
     user = await crud.get_user_by_username(username=form_data.username)
-    if not user or not security.verify_password(form_data.password, user.password_hash):
+    try:
+        password_ok = user is not None and await security.verify_password_async(form_data.password, user.password_hash)
+    except security.PasswordHashQueueFull:
+        raise _hashing_busy_exception()
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -80,33 +232,185 @@ app_router = APIRouter()
 
 # --- Program Routes ---
 
+def _schedule_exception(error: Exception) -> HTTPException:
+    """Відповідь на невалідний час програми (422) або перетин з іншими програмами каналу (409)."""
+    if isinstance(error, crud.InvalidProgramTimesError):
+        return HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="end_time must be after start_time")
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={
+            "message": "Program overlaps other programs of the channel",
+            "conflicts": [
+                {
+                    "id": str(conflict["_id"]),
+                    "title": conflict.get("title"),
+                    "start_time": conflict["start_time"].isoformat(),
+                    "end_time": conflict["end_time"].isoformat(),
+                }
+                for conflict in error.conflicts
+            ],
+        },
+    )
+
 @app_router.post("/programs/", response_model=schemas.TVProgramResponse, status_code=status.HTTP_201_CREATED)
 async def create_program_endpoint( 
     program: schemas.TVProgramCreate,
     current_admin: User = Depends(get_current_active_admin_user)
 ):
     """Створює нову телепрограму (тільки для адмінів)."""
-    created_program = await crud.create_tv_program(program_data=program)
+    try:
+        created_program = await crud.create_tv_program(program_data=program)
+    except (crud.InvalidProgramTimesError, crud.ScheduleOverlapError) as e:
+        raise _schedule_exception(e)
     if created_program is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Channel with id {program.channel_id} not found"
         )
-    await created_program.fetch_link(TVProgram.channel)
     return created_program
 
-@app_router.get("/programs/", response_model=List[schemas.TVProgramResponse])
-async def get_all_programs_endpoint(): 
-    """Отримує список всіх телепрограм."""
-    return await crud.get_all_tv_programs()
+@app_router.post("/programs/bulk", response_model=schemas.BulkIngestResponse)
+async def bulk_create_programs_endpoint(
+    programs: List[Any] = Body(...),
+    batch_size: int = Query(crud.PROGRAM_BULK_BATCH_SIZE, ge=1, le=10000),
+    ordered: bool = False,
+    current_admin: User = Depends(get_current_active_admin_user)
+):
+    """
+    Масово імпортує програми з JSON-масиву (тільки для адмінів).
+    Невалідні рядки (зокрема не-об'єкти) пропускаються і потрапляють у звіт про помилки.
+    """
+    return await crud.bulk_create_tv_programs(enumerate(programs), batch_size=batch_size, ordered=ordered)
+
+@app_router.post("/programs/bulk/xmltv", response_model=schemas.BulkIngestResponse)
+async def bulk_create_programs_xmltv_endpoint(
+    file: UploadFile = File(...),
+    batch_size: int = Query(crud.PROGRAM_BULK_BATCH_SIZE, ge=1, le=10000),
+    ordered: bool = False,
+    current_admin: User = Depends(get_current_active_admin_user)
+):
+    """Масово імпортує програми з XMLTV-файлу (тільки для адмінів)."""
+    import xmltv # Розбір XML потрібен лише імпорту й експорту - не під час старту воркера
+    channel_ids_by_name = {channel.name: str(channel.id) for channel in await crud.get_all_channels()}
+    rows = xmltv.aiter_xmltv_programmes(file.file, channel_ids_by_name)
+    return await crud.bulk_create_tv_programs(rows, batch_size=batch_size, ordered=ordered)
+
+@app_router.get("/programs/export")
+async def export_programs_endpoint(
+    request: Request,
+    format: str = Query("xmltv", pattern="^(xmltv|csv|ndjson)$"),
+    from_time: Optional[datetime] = Query(None, alias="from"),
+    to_time: Optional[datetime] = Query(None, alias="to"),
+    channel_ids: Optional[List[PydanticObjectId]] = Query(None),
+):
+    """
+    Потоково експортує розклад у форматі XMLTV, CSV або NDJSON.
+    Архівні програми потрапляють в експорт, лише якщо from раніше за межу архівації.
+    Відповідь стискається на льоту за Accept-Encoding.
+    """
+    import export # Як і xmltv, імпортується при першому експорті
+    channels = await crud.get_all_channels()
+    documents = crud.iter_program_documents(
+        crud.program_window_query(from_time, to_time, channel_ids),
+        include_archive=crud.reads_archive(from_time),
+    )
+    body = export.render_export(format, documents, channels)
+
+    media_type, extension = export.EXPORT_FORMATS[format]
+    headers = {"Content-Disposition": f'attachment; filename="schedule.{extension}"', "Vary": "Accept-Encoding"}
+    # Кодування вибирається так само, як для решти маршрутів (з урахуванням q); brotli стисне CompressionMiddleware
+    if compression.choose_encoding(request.headers.get("accept-encoding", "")) == "gzip":
+        body = export.gzip_stream(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+async def _programs_ndjson(cursor: Optional[str], selection: Optional[FieldSelection] = None) -> AsyncIterator[bytes]:
+    """Віддає програми рядками NDJSON у міру читання пачок з курсора Mongo."""
+    async for batch in crud.iter_tv_programs(cursor=cursor, projection=_program_projection(selection)):
+        yield b"".join(encode_json(select_fields(program, selection)) + b"\n" for program in batch)
+
+@app_router.get("/programs/search", response_model=schemas.ProgramSearchResponse)
+async def search_programs_endpoint(
+    q: Optional[str] = Query(None, min_length=1),
+    tags: Optional[List[str]] = Query(None),
+    channel_ids: Optional[List[PydanticObjectId]] = Query(None),
+    limit: int = Query(20, ge=1, le=crud.PROGRAM_SEARCH_MAX_LIMIT),
+    skip: int = Query(0, ge=0, le=10000),
+):
+    """
+    Шукає телепрограми за текстом у назві та описі і за тегами (усі теги мають збігатися).
+    Повертає сторінку результатів за релевантністю і фасети по тегах та каналах.
+    Потрібен хоча б один фільтр: без нього підрахунок і фасети йшли б по всій колекції.
+    """
+    if not (q or tags or channel_ids):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Specify at least one of q, tags or channel_ids",
+        )
+    return await crud.search_tv_programs(q=q, tags=tags, channel_ids=channel_ids, limit=limit, skip=skip)
+
+@app_router.post("/programs/batch", response_model=schemas.TVProgramBatchResponse)
+async def get_programs_batch_endpoint(batch: schemas.TVProgramBatchRequest, fields: Optional[str] = None):
+    """
+    Отримує кілька програм за списком ID одним запитом до бази (для списків перегляду, підбірок).
+    Програми повертаються в порядку ID із запиту, ненайдені ID - окремим списком.
+    """
+    selection = parse_fields(fields, PROGRAM_RESPONSE_FIELDS)
+    programs, missing = await crud.get_program_documents(batch.ids, projection=_program_projection(selection))
+    items = [select_fields(program, selection) for program in programs]
+    return Response(content=encode_json({"items": items, "missing": missing}), media_type="application/json")
+
+@app_router.get("/programs/", response_model=schemas.TVProgramPage)
+async def get_all_programs_endpoint(
+    request: Request,
+    limit: int = Query(crud.PROGRAM_PAGE_DEFAULT_LIMIT, ge=1, le=crud.PROGRAM_PAGE_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    format: str = Query("json", pattern="^(json|ndjson)$"),
+    fields: Optional[str] = None,
+):
+    """
+    Отримує сторінку телепрограм, відсортованих за часом початку.
+    Для наступної сторінки передайте курсор `next` з попередньої відповіді.
+    З format=ndjson віддає всі програми (після курсора) потоком NDJSON.
+    fields=id,title,channel.name обмежує поля програм (інші поля не читаються з бази).
+    """
+    try:
+        if cursor:
+            crud.decode_program_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    selection = parse_fields(fields, PROGRAM_RESPONSE_FIELDS)
+
+    if format == "ndjson":
+        return StreamingResponse(_programs_ndjson(cursor, selection), media_type="application/x-ndjson")
+
+    async def produce() -> bytes:
+        programs, next_cursor = await crud.get_tv_programs_page(
+            limit=limit, cursor=cursor, projection=_program_projection(selection)
+        )
+        return encode_json({"items": [select_fields(program, selection) for program in programs], "next": next_cursor})
+
+    return await cached_json_response(request, ("programs", "channels"), produce)
 
 @app_router.get("/programs/{program_id}", response_model=schemas.TVProgramResponse)
-async def get_program_endpoint(program_id: PydanticObjectId): 
-    """Отримує конкретну телепрограму за її ID."""
-    program = await crud.get_tv_program(program_id=program_id)
-    if program is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Program not found")
-    return program
+async def get_program_endpoint(program_id: PydanticObjectId, request: Request, fields: Optional[str] = None): 
+    """
+    Отримує конкретну телепрограму за її ID.
+    ETag має вигляд "<revision>.<хеш тіла>", тож його можна передати в If-Match при PATCH.
+    """
+    selection = parse_fields(fields, PROGRAM_RESPONSE_FIELDS)
+    projection = _program_projection(selection)
+    if projection is not None:
+        # Ревізія потрібна для ETag, навіть якщо її не вибрано у fields
+        projection = {**projection, "revision": 1}
+
+    async def produce() -> Tuple[bytes, str]:
+        program = await crud.get_program_document(program_id=program_id, projection=projection)
+        if program is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Program not found")
+        return encode_json(select_fields(program, selection)), f"{program['revision']}."
+
+    return await cached_json_response(request, ("programs", "channels"), produce)
 
 @app_router.put("/programs/{program_id}", response_model=schemas.TVProgramResponse)
 async def update_program_endpoint(
@@ -115,14 +419,64 @@ async def update_program_endpoint(
     current_admin: User = Depends(get_current_active_admin_user)
 ):
     """Оновлює телепрограму за ID (тільки для адмінів)."""
-    updated_program = await crud.update_tv_program(
-        program_id=program_id,
-        updated_data=updated_program_data
-    )
+    try:
+        updated_program = await crud.update_tv_program(
+            program_id=program_id,
+            updated_data=updated_program_data
+        )
+    except (crud.InvalidProgramTimesError, crud.ScheduleOverlapError) as e:
+        raise _schedule_exception(e)
     if updated_program is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Program or associated new Channel not found")
     return updated_program
 
+def _parse_if_match(if_match: str) -> Optional[int]:
+    """
+    Розбирає If-Match з ревізією програми: "3", W/"3" або ETag з GET /programs/{id} ("3.<хеш>").
+    Невалідне значення - None.
+    """
+    value = if_match.strip().removeprefix("W/").strip('"').partition(".")[0]
+    return int(value) if value.isdigit() else None
+
+@app_router.patch("/programs/{program_id}", response_model=schemas.TVProgramResponse)
+async def patch_program_endpoint(
+    program_id: PydanticObjectId,
+    changes: schemas.TVProgramUpdate,
+    if_match: Optional[str] = Header(None),
+    current_admin: User = Depends(get_current_active_admin_user)
+):
+    """
+    Частково оновлює телепрограму (тільки для адмінів).
+    З заголовком If-Match: "<revision>" (або ETag з GET) оновлення виконається, лише якщо програму ніхто не змінив.
+    If-Match: * лише вимагає, щоб програма існувала.
+    Відповідь має той самий ETag "<revision>.<хеш тіла>", що й наступний GET /programs/{id}.
+    """
+    expected_revision = None
+    if if_match is not None and if_match.strip() != "*":
+        expected_revision = _parse_if_match(if_match)
+        if expected_revision is None:
+            raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Invalid If-Match revision")
+    try:
+        program = await crud.patch_tv_program(program_id=program_id, changes=changes, expected_revision=expected_revision)
+    except crud.RevisionConflictError:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail="Program was modified by another request"
+        )
+    except crud.ConcurrentUpdateError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Program is being modified by another request, try again"
+        )
+    except (crud.InvalidProgramTimesError, crud.ScheduleOverlapError) as e:
+        raise _schedule_exception(e)
+    if program is None:
+        if expected_revision is None and if_match is not None and not await crud.program_exists(program_id):
+            raise HTTPException(status_code=status.HTTP_412_PRECONDITION_FAILED, detail="Program not found")
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Program or associated new Channel not found")
+    body = encode_json(program)
+    return Response(content=body, media_type="application/json", headers={"ETag": response_etag(body, f"{program['revision']}.")})
+
 @app_router.delete("/programs/{program_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_program_endpoint(
     program_id: PydanticObjectId, 
@@ -134,23 +488,148 @@ async def delete_program_endpoint(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Program not found")
     return None
 
+# --- Schedule Routes ---
+
+# Максимальна ширина вікна сітки мовлення
+SCHEDULE_MAX_WINDOW = timedelta(days=14)
+
+@app_router.get("/schedule", response_model=List[schemas.ChannelScheduleResponse])
+async def get_schedule_endpoint(
+    from_time: datetime = Query(..., alias="from"),
+    to_time: datetime = Query(..., alias="to"),
+    channel_ids: Optional[List[PydanticObjectId]] = Query(None),
+):
+    """Отримує сітку мовлення за часове вікно, згруповану за каналами."""
+    if to_time <= from_time:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'to' must be later than 'from'")
+    if to_time - from_time > SCHEDULE_MAX_WINDOW:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Schedule window must not exceed {SCHEDULE_MAX_WINDOW.days} days"
+        )
+    schedule = await crud.get_schedule(start=from_time, end=to_time, channel_ids=channel_ids)
+    return [{"channel": channel, "programs": programs} for channel, programs in schedule]
+
+@app_router.get("/schedule/now", response_model=List[schemas.ChannelNowNextResponse])
+async def get_now_next_endpoint(channel_ids: Optional[List[PydanticObjectId]] = Query(None)):
+    """Отримує поточну та наступну програму для кожного каналу."""
+    now_next = await crud.get_now_next(at=datetime.now(timezone.utc), channel_ids=channel_ids)
+    return [{"channel": channel, "now": now, "next": upcoming} for channel, now, upcoming in now_next]
+
 # --- Channel Routes ---
 
 @app_router.get("/channels/", response_model=List[schemas.TVChannelBasicResponse])
-async def read_channels_endpoint(): 
+async def read_channels_endpoint(request: Request, fields: Optional[str] = None): 
     """Отримує список всіх телеканалів (базова інформація)."""
-    return await crud.get_all_channels()
+    selection = parse_fields(fields, CHANNEL_RESPONSE_FIELDS)
 
-@app_router.get("/channels/{channel_id}", response_model=schemas.TVChannelResponse)
-async def read_channel_with_programs_endpoint(channel_id: PydanticObjectId): 
-    """Отримує канал за ID разом з його програмами."""
-    result  = await crud.get_channel_and_programs(channel_id=channel_id)
-    if result  is None:
+    async def produce() -> bytes:
+        channels = await crud.get_all_channels()
+        if selection is not None:
+            return encode_json([
+                select_fields({"id": channel.id, "name": channel.name, "country": channel.country}, selection)
+                for channel in channels
+            ])
+        return render_json(List[schemas.TVChannelBasicResponse], channels)
+
+    return await cached_json_response(request, ("channels",), produce)
+
+@app_router.post("/channels/", response_model=schemas.TVChannelBasicResponse, status_code=status.HTTP_201_CREATED)
+async def create_channel_endpoint(
+    channel: schemas.TVChannelCreate,
+    current_admin: User = Depends(get_current_active_admin_user)
+):
+    """Створює новий телеканал (тільки для адмінів)."""
+    try:
+        return await crud.create_channel(channel_data=channel)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Channel name already exists")
+
+@app_router.put("/channels/{channel_id}", response_model=schemas.TVChannelBasicResponse)
+async def update_channel_endpoint(
+    channel_id: PydanticObjectId,
+    channel: schemas.TVChannelCreate,
+    background_tasks: BackgroundTasks,
+    current_admin: User = Depends(get_current_active_admin_user)
+):
+    """
+    Оновлює телеканал за ID (тільки для адмінів).
+    Знімки каналу в програмах оновлюються у фоні після відповіді.
+    """
+    try:
+        updated_channel = await crud.update_channel(channel_id=channel_id, channel_data=channel)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Channel name already exists")
+    if updated_channel is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Channel not found")
-    channel, programs = result
-    channel_data = channel.model_dump() 
-    channel_data["programs"] = programs 
-    return channel_data
+    background_tasks.add_task(crud.fan_out_channel_snapshot, updated_channel)
+    return updated_channel
+
+@app_router.get("/channels/{channel_id}/days/{day}", response_model=schemas.ChannelDayResponse)
+async def read_channel_day_endpoint(channel_id: PydanticObjectId, day: date, request: Request):
+    """Розклад каналу на добу (UTC) з матеріалізованого документа channel_days."""
+    async def produce() -> bytes:
+        channel_day = await crud.get_channel_day(channel_id=channel_id, day=day)
+        if channel_day is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Channel not found")
+        return encode_json(channel_day)
+
+    return await cached_json_response(request, ("programs", "channels"), produce)
+
+@app_router.get("/channels/{channel_id}", response_model=schemas.TVChannelResponse)
+async def read_channel_with_programs_endpoint(channel_id: PydanticObjectId, request: Request, fields: Optional[str] = None): 
+    """
+    Отримує канал за ID разом з його програмами.
+    fields=name,programs.title,programs.start_time обмежує поля каналу та програм.
+    """
+    selection = parse_fields(fields, CHANNEL_WITH_PROGRAMS_RESPONSE_FIELDS)
+
+    async def produce() -> bytes:
+        if selection is not None and "programs" not in selection:
+            # Програми не потрібні - канал береться з каталогу без запиту до програм
+            channel = await channel_catalog.get(channel_id)
+            channel_data = {"id": channel.id, "name": channel.name, "country": channel.country} if channel else None
+        else:
+            channel_data = await crud.get_channel_with_program_documents(
+                channel_id=channel_id,
+                projection=_program_projection(selection["programs"]) if selection is not None else None,
+            )
+        if channel_data is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Channel not found")
+        return encode_json(select_fields(channel_data, selection))
+
+    return await cached_json_response(request, ("programs", "channels"), produce)
+
+# --- Stats Routes ---
+
+@app_router.get("/stats")
+async def read_stats_endpoint():
+    """Повертає лічильники кешів (для перевірки, наскільки вони розвантажують базу)."""
+    return {
+        "channel_catalog": channel_catalog.stats(),
+        "response_cache": response_cache.stats(),
+        "response_coalescing": response_flights.stats(),
+        "principal_cache": principal_cache.stats(),
+        "password_hashing": security.hashing_stats(),
+        "archive": archiver.stats(),
+    }
+
+@app_router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def read_metrics_endpoint():
+    """Метрики маршрутів, команд MongoDB, кешів і пулу з'єднань у форматі Prometheus."""
+    pool = database.pool_stats.stats()
+    hashing = security.hashing_stats()
+    cache = response_cache.stats()
+    gauges = {
+        "mongodb_pool_connections_open": pool["connections_open"],
+        "mongodb_pool_connections_in_use": pool["in_use"],
+        "password_hash_in_flight": hashing["in_flight"],
+        "password_hash_queue_depth": hashing["queue_depth"],
+        "response_cache_hits": cache["hits"],
+        "response_cache_misses": cache["misses"],
+        "response_coalescing_ratio": response_flights.stats()["coalescing_ratio"],
+    }
+    return PlainTextResponse(metrics.registry.render(gauges), media_type="text/plain; version=0.0.4")
 
 # --- User Routes ---
 
@@ -158,3 +637,33 @@ async def read_channel_with_programs_endpoint(channel_id: PydanticObjectId):
 async def read_users_me(current_user: User = Depends(get_current_user)):
     """Повертає дані поточного автентифікованого користувача."""
     return current_user
+
+# --- Роутер перевірок стану ---
+health_router = APIRouter(
+    prefix="/health",
+    tags=["Health"]
+)
+
+@health_router.get("/live")
+async def liveness_endpoint():
+    """Процес живий і обробляє запити (без звернення до бази)."""
+    return {"status": "ok"}
+
+@health_router.get("/ready")
+async def readiness_endpoint(response: Response):
+    """
+    Готовність приймати трафік: MongoDB відповідає на ping.
+    Разом зі статусом повертає налаштування та статистику пулу з'єднань.
+    """
+    try:
+        await database.ping_db()
+        ready = True
+    except Exception as e:
+        print(f"Перевірка готовності не пройдена: {e}")
+        ready = False
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "status": "ok" if ready else "unavailable",
+        "pool": {**database.pool_options(), **database.pool_stats.stats()},
+    }
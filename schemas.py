@@ -1,6 +1,6 @@
 
-from pydantic import BaseModel, Field, ConfigDict 
-from datetime import datetime
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from datetime import date, datetime, timezone
 from typing import Optional, List
 from beanie import PydanticObjectId
 
@@ -14,8 +14,25 @@ class TVProgramBase(BaseModel):
     channel_id: str
     tags: Optional[List[str]] = None
 
+def _as_utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
 class TVProgramCreate(TVProgramBase):
-    pass
+    @model_validator(mode="after")
+    def check_times(self):
+        # Порівнюємо в UTC: клієнти можуть передавати час і з зоною, і без
+        if _as_utc(self.end_time) <= _as_utc(self.start_time):
+            raise ValueError("end_time must be after start_time")
+        return self
+
+class TVProgramUpdate(BaseModel):
+    """Часткове оновлення програми: передаються лише змінені поля."""
+    title: Optional[str] = None
+    description: Optional[str] = None
+    start_time: Optional[datetime] = None
+    end_time: Optional[datetime] = None
+    channel_id: Optional[str] = None
+    tags: Optional[List[str]] = None
 
 # --- TVChannel Schemas ---
 class TVChannelBase(BaseModel):
@@ -33,6 +50,7 @@ class TVProgramResponseBase(BaseModel):
     start_time: datetime
     end_time: datetime
     tags: Optional[List[str]] = None
+    revision: int = 0 # Передається в If-Match для PATCH
     
 
 class TVChannelBasicResponse(TVChannelBase):
@@ -58,6 +76,7 @@ class TVProgramResponse(TVProgramResponseBase):
                 "start_time": "2024-01-01T12:00:00",     
                 "end_time": "2024-01-01T13:00:00",       
                 "tags": ["news", "live"],                
+                "revision": 0,
                 "channel": {                            
                     "id": "65f1c3a0d5e6f7a8b9c0d1e1",
                     "name": "Example Channel",
@@ -67,6 +86,70 @@ class TVProgramResponse(TVProgramResponseBase):
         }
     )
 
+# --- Сторінка програм (keyset-пагінація) ---
+class TVProgramPage(BaseModel):
+    items: List[TVProgramResponse]
+    next: Optional[str] = None # Курсор наступної сторінки, None - якщо сторінка остання
+
+# --- Пакетне отримання програм за ID ---
+# Скільки ID можна передати в одному запиті (більші пакети відхиляє валідація, до звернення до бази)
+PROGRAM_BATCH_MAX_IDS = 200
+
+class TVProgramBatchRequest(BaseModel):
+    ids: List[PydanticObjectId] = Field(..., min_length=1, max_length=PROGRAM_BATCH_MAX_IDS)
+
+class TVProgramBatchResponse(BaseModel):
+    items: List[TVProgramResponse] # У порядку ID із запиту (повтори пропускаються)
+    missing: List[PydanticObjectId] = [] # ID, для яких програм не знайдено
+
+# --- Пошук програм ---
+class TagFacet(BaseModel):
+    value: str
+    count: int
+
+class ChannelFacet(BaseModel):
+    channel_id: PydanticObjectId
+    name: Optional[str] = None
+    count: int
+
+class ProgramSearchFacets(BaseModel):
+    tags: List[TagFacet] = []
+    channels: List[ChannelFacet] = []
+
+class ProgramSearchResponse(BaseModel):
+    items: List[TVProgramResponse]
+    total: int
+    facets: ProgramSearchFacets
+
+# --- Масовий імпорт програм ---
+class BulkIngestError(BaseModel):
+    row: int # Номер рядка (з нуля) у вхідному масиві чи XMLTV-файлі
+    detail: str
+
+class BulkIngestResponse(BaseModel):
+    received: int
+    inserted: int
+    failed: int
+    skipped: int = 0 # Рядки після зупинки впорядкованого імпорту (received = inserted + failed + skipped)
+    errors: List[BulkIngestError] = []
+    warnings: List[BulkIngestError] = [] # Вставлені рядки, що перетинаються з іншими програмами або були обрізані
+
+# --- Сітка мовлення (EPG) ---
+class ChannelScheduleResponse(BaseModel):
+    channel: TVChannelBasicResponse
+    programs: List[TVProgramResponseBase] = []
+
+# --- Розклад каналу на добу ---
+class ChannelDayResponse(BaseModel):
+    channel: TVChannelBasicResponse
+    date: date
+    programs: List[TVProgramResponseBase] = []
+
+class ChannelNowNextResponse(BaseModel):
+    channel: TVChannelBasicResponse
+    now: Optional[TVProgramResponseBase] = None
+    next: Optional[TVProgramResponseBase] = None
+
 # --- Оновлена TVChannelResponse ---
 class TVChannelResponse(TVChannelBase):
     id: PydanticObjectId
@@ -1,11 +1,14 @@
 # security.py
+import asyncio
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Callable, Optional, TypeVar
 
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from functools import lru_cache
 from dotenv import load_dotenv
+import metrics
 
 load_dotenv() 
 
@@ -13,20 +16,81 @@ load_dotenv()
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 JWT_ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+# Окремий пул потоків для bcrypt, щоб хешування не блокувало event loop
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", 4))
+# Скільки запитів можуть чекати на вільний потік, перш ніж ми почнемо відмовляти
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", 100))
 
 if not JWT_SECRET_KEY:
     raise ValueError("Не встановлено JWT_SECRET_KEY в .env файлі")
 
 # --- Хешування паролів ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+@lru_cache(maxsize=None)
+def get_pwd_context():
+    """
+    Створює контекст passlib при першому використанні, а не під час імпорту,
+    щоб не сповільнювати старт воркера.
+    """
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Перевіряє, чи збігається звичайний пароль з хешованим."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def hash_password(password: str) -> str:
     """Хешує пароль для збереження."""
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+class PasswordHashQueueFull(Exception):
+    """Черга на хешування паролів переповнена."""
+
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+_hash_semaphore = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
+_hash_stats = {"in_flight": 0, "queue_depth": 0, "max_queue_depth": 0, "completed": 0, "rejected": 0}
+
+T = TypeVar("T")
+
+async def _run_hashing(func: Callable[..., T], *args) -> T:
+    """
+    Виконує bcrypt у пулі потоків. Одночасно працює не більше PASSWORD_HASH_WORKERS операцій,
+    решта чекає в черзі; якщо черга довша за PASSWORD_HASH_MAX_QUEUE - викликає PasswordHashQueueFull.
+    """
+    if _hash_semaphore.locked():
+        # Усі потоки зайняті - стаємо в чергу
+        if _hash_stats["queue_depth"] >= PASSWORD_HASH_MAX_QUEUE:
+            _hash_stats["rejected"] += 1
+            raise PasswordHashQueueFull()
+        _hash_stats["queue_depth"] += 1
+        _hash_stats["max_queue_depth"] = max(_hash_stats["max_queue_depth"], _hash_stats["queue_depth"])
+        try:
+            await _hash_semaphore.acquire()
+        finally:
+            _hash_stats["queue_depth"] -= 1
+    else:
+        await _hash_semaphore.acquire()
+
+    _hash_stats["in_flight"] += 1
+    started = time.perf_counter()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_executor, func, *args)
+    finally:
+        metrics.record_timing("hash", time.perf_counter() - started)
+        _hash_stats["in_flight"] -= 1
+        _hash_stats["completed"] += 1
+        _hash_semaphore.release()
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Перевіряє пароль у пулі потоків, не блокуючи event loop."""
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    """Хешує пароль у пулі потоків, не блокуючи event loop."""
+    return await _run_hashing(hash_password, password)
+
+def hashing_stats() -> dict:
+    """Стан пулу хешування паролів (глибина черги, кількість операцій)."""
+    return {"workers": PASSWORD_HASH_WORKERS, "max_queue": PASSWORD_HASH_MAX_QUEUE, **_hash_stats}
 
 # --- Робота з JWT ---
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -38,25 +102,26 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         expire = datetime.now(timezone.utc) + timedelta(minutes=JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
 
     to_encode.update({"exp": expire})
+    from jose import jwt # python-jose імпортується при першому токені, як і passlib
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET_KEY, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str, credentials_exception) -> Optional[str]:
+def decode_token(token: str, credentials_exception) -> dict:
     """
     Перевіряє JWT токен.
-    Повертає ім'я користувача (sub) якщо токен валідний, інакше викликає виняток.
+    Повертає вміст токена (payload) з обов'язковим полем sub, інакше викликає виняток.
     """
+    from jose import JWTError, jwt
     try:
         # Декодуємо токен
         payload = jwt.decode(token, JWT_SECRET_KEY, algorithms=[JWT_ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+        if payload.get("sub") is None:
             raise credentials_exception
-        return username
+        return payload
     except JWTError:
         # Якщо сталася помилка декодування або підпис невірний
         raise credentials_exception
     except Exception as e:
         # Інші можливі помилки
         print(f"Помилка верифікації токена: {e}") 
-        raise credentials_exception
\ No newline at end of file
+        raise credentials_exception
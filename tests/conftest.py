@@ -0,0 +1,89 @@
+"""
+Спільні фікстури тестів.
+
+Тести працюють зі справжнім MongoDB (mongomock не виконує explain і не надсилає команд через
+монітор PyMongo): база з TEST_MONGODB_URI або тимчасовий mongod з PATH, інакше тести пропускаються.
+"""
+import asyncio
+import importlib.util
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TEST_DATABASE = "tv_program_test"
+# Налаштування читаються під час імпорту модулів застосунку (MONGODB_URI задає фікстура run_with_db)
+os.environ["DATABASE_NAME"] = TEST_DATABASE
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+
+def _local_mongod_class():
+    """LocalMongod з benchmarks/load.py (теку benchmarks не додаємо в sys.path - там є модулі з тими ж іменами)."""
+    spec = importlib.util.spec_from_file_location("benchmarks_load", os.path.join(ROOT, "benchmarks", "load.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.LocalMongod
+
+@pytest.fixture(scope="session")
+def mongo_uri():
+    uri = os.getenv("TEST_MONGODB_URI")
+    if uri:
+        yield uri
+        return
+    if shutil.which("mongod") is None:
+        pytest.skip("Потрібен mongod у PATH або TEST_MONGODB_URI")
+    mongod = _local_mongod_class()()
+    mongod.start()
+    try:
+        yield mongod.uri
+    finally:
+        mongod.stop()
+
+@pytest.fixture
+def run_with_db(mongo_uri):
+    """
+    Виконує корутину на порожній тестовій базі. Підключення - як у застосунку
+    (database.init_db_connection з індексами і слухачами команд), після корутини закривається.
+    """
+    os.environ["MONGODB_URI"] = mongo_uri
+    import database
+    from cache import channel_catalog, response_cache
+
+    def run(coroutine_function):
+        async def main():
+            await database.init_db_connection(fast_start=True, sync_indexes=False, seed=False)
+            await database.get_client().drop_database(TEST_DATABASE)
+            database.close_db_connection()
+            await database.init_db_connection(fast_start=True, sync_indexes=True, seed=False)
+            channel_catalog.invalidate()
+            response_cache.clear()
+            try:
+                return await coroutine_function()
+            finally:
+                database.close_db_connection()
+
+        return asyncio.run(main())
+
+    return run
+
+@pytest.fixture
+def run_with_app(run_with_db):
+    """
+    Як run_with_db, але корутина отримує httpx-клієнт до ASGI-застосунку
+    (lifespan не запускається - базу вже підключено).
+    """
+    import httpx
+    import main
+
+    def run(coroutine_function):
+        async def with_client():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await coroutine_function(client)
+
+        return run_with_db(with_client)
+
+    return run
@@ -0,0 +1,49 @@
+"""
+Звіт масового імпорту (POST /programs/bulk): не-об'єкт у масиві - помилка рядка, а не 422 всього запиту;
+впорядкований імпорт зупиняється на першому помилковому рядку будь-якої причини, решта - skipped.
+"""
+from datetime import datetime, timedelta
+
+import crud
+import schemas
+
+ADMIN_PASSWORD = "admin-password"
+START = datetime(2024, 1, 1, 12)
+
+async def _admin_headers(client) -> dict:
+    await crud.create_user(schemas.UserCreate(username="admin", password=ADMIN_PASSWORD, role="admin"))
+    response = await client.post("/auth/token", data={"username": "admin", "password": ADMIN_PASSWORD})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def _program(channel_id: str, hour: int) -> dict:
+    return {
+        "title": f"Program {hour}",
+        "description": "d",
+        "start_time": (START + timedelta(hours=hour)).isoformat(),
+        "end_time": (START + timedelta(hours=hour + 1)).isoformat(),
+        "channel_id": channel_id,
+    }
+
+async def _bulk_reports(client) -> dict:
+    headers = await _admin_headers(client)
+    channel_id = str((await crud.create_channel(schemas.TVChannelCreate(name="Channel", country="UA"))).id)
+    missing_channel_id = "0" * 24
+
+    reports = {}
+    body = [_program(channel_id, 0), 42, _program(channel_id, 1)]
+    reports["non-object"] = (await client.post("/programs/bulk", json=body, headers=headers)).json()
+    # Відсутній канал зупиняє впорядкований імпорт так само, як помилка валідації чи перетин
+    body = [_program(channel_id, 2), _program(missing_channel_id, 3), _program(channel_id, 4), _program(channel_id, 5)]
+    reports["ordered"] = (await client.post("/programs/bulk", json=body, params={"ordered": True}, headers=headers)).json()
+    return reports
+
+def test_bulk_report_counts_every_row(run_with_app):
+    reports = run_with_app(_bulk_reports)
+
+    non_object = reports["non-object"]
+    assert (non_object["received"], non_object["inserted"], non_object["failed"], non_object["skipped"]) == (3, 2, 1, 0)
+    assert non_object["errors"][0]["row"] == 1
+
+    ordered = reports["ordered"]
+    assert (ordered["received"], ordered["inserted"], ordered["failed"], ordered["skipped"]) == (4, 1, 1, 2)
+    assert [error["row"] for error in ordered["errors"]] == [1]
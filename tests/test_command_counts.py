@@ -0,0 +1,62 @@
+"""
+Кількість команд MongoDB у списках програм не залежить від кількості програм (без N+1 на канали):
+GET /programs/ (crud.get_tv_programs_page) і GET /channels/{id} (crud.get_channel_with_program_documents).
+"""
+from datetime import datetime, timedelta
+
+import crud
+import metrics
+import schemas
+from cache import channel_catalog
+
+CHANNELS = 5
+SCHEDULE_START = datetime(2024, 1, 1)
+
+def _issued_commands() -> int:
+    """Команди, пораховані metrics.CommandMetricsListener (без getMore: їх кількість залежить від розміру відповіді)."""
+    return sum(count for command, count in metrics.registry.mongo_commands.items() if command != "getMore")
+
+async def _seed(programs: int) -> str:
+    """Створює канали і програми (рівномірно по каналах), повертає ID першого каналу."""
+    channels = [
+        await crud.create_channel(schemas.TVChannelCreate(name=f"Channel {i}", country="UA"))
+        for i in range(CHANNELS)
+    ]
+    rows = (
+        (row, {
+            "title": f"Program {row}",
+            "description": "Test programme",
+            "start_time": SCHEDULE_START + timedelta(hours=row),
+            "end_time": SCHEDULE_START + timedelta(hours=row + 1),
+            "channel_id": str(channels[row % CHANNELS].id),
+        })
+        for row in range(programs)
+    )
+    report = await crud.bulk_create_tv_programs(rows)
+    assert report["inserted"] == programs
+    return str(channels[0].id)
+
+async def _get_counting_commands(client, url: str, params: dict) -> int:
+    # Каталог каналів порожній, тож канали справді читаються з бази
+    channel_catalog.invalidate()
+    before = _issued_commands()
+    response = await client.get(url, params=params)
+    assert response.status_code == 200
+    return _issued_commands() - before
+
+def _commands_for(programs: int):
+    async def run(client) -> dict:
+        channel_id = await _seed(programs)
+        page = {"limit": crud.PROGRAM_PAGE_MAX_LIMIT}
+        return {
+            "GET /programs/": await _get_counting_commands(client, "/programs/", page),
+            "GET /channels/{id}": await _get_counting_commands(client, f"/channels/{channel_id}", {}),
+        }
+    return run
+
+def test_listing_command_count_is_flat(run_with_app):
+    few = run_with_app(_commands_for(10))
+    many = run_with_app(_commands_for(500))
+    assert few == many
+    # Запит програм і щонайбільше один запит каталогу каналів
+    assert all(count <= 2 for count in many.values())
@@ -0,0 +1,64 @@
+"""
+Change stream програм (live.watch_programs): перенесення програми на інший канал доходить
+до підписників обох каналів, а видалення архівацією не розсилається.
+Потрібен replica set (TEST_MONGODB_URI), інакше тест пропускається.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import crud
+import schemas
+
+START = datetime(2024, 1, 1, 12)
+
+async def _received(subscriber, event_type: str) -> bool:
+    """Чи отримав підписник подію event_type (без pre-images перед нею може прийти program.deleted)."""
+    try:
+        while (await asyncio.wait_for(subscriber.queue.get(), 10)).type != event_type:
+            pass
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+async def _live_events() -> dict:
+    # Модулі застосунку, що читають MONGODB_URI під час імпорту
+    import database
+    import live
+
+    hello = await database.get_client().admin.command("hello")
+    if "setName" not in hello:
+        pytest.skip("Change streams потребують replica set")
+    await database.enable_program_pre_images()
+
+    old_channel = await crud.create_channel(schemas.TVChannelCreate(name="Old", country="UA"))
+    new_channel = await crud.create_channel(schemas.TVChannelCreate(name="New", country="UA"))
+    program = await crud.create_tv_program(schemas.TVProgramCreate(
+        title="Program", description="d", start_time=START, end_time=START + timedelta(hours=1), channel_id=str(old_channel.id),
+    ))
+    old_subscriber = live.broadcaster.subscribe([str(old_channel.id)])
+    new_subscriber = live.broadcaster.subscribe([str(new_channel.id)])
+    watcher = asyncio.create_task(live.watch_programs())
+    try:
+        # Потік має відкритися до запису, інакше зміну не буде видно
+        await asyncio.sleep(1)
+        await crud.patch_tv_program(program.id, schemas.TVProgramUpdate(channel_id=str(new_channel.id)))
+        events = {
+            "old removed": await _received(old_subscriber, "program.deleted"),
+            "new updated": await _received(new_subscriber, "program.updated"),
+        }
+        # Архівація видаляє програму з programs - підписникам повідомляти нічого
+        await crud.archive_aired_programs(cutoff=START + timedelta(days=1), pause_seconds=0)
+        await asyncio.sleep(1)
+        events["after archive"] = old_subscriber.queue.qsize() + new_subscriber.queue.qsize()
+        return events
+    finally:
+        watcher.cancel()
+        await asyncio.gather(watcher, return_exceptions=True)
+        live.broadcaster.unsubscribe(old_subscriber)
+        live.broadcaster.unsubscribe(new_subscriber)
+
+def test_channel_move_reaches_old_and_new_channel(run_with_db):
+    events = run_with_db(_live_events)
+    assert events == {"old removed": True, "new updated": True, "after archive": 0}
@@ -0,0 +1,33 @@
+"""ETag відповіді PATCH /programs/{id} збігається з ETag наступного GET і придатний для If-Match."""
+from datetime import datetime, timedelta
+
+import crud
+import schemas
+
+ADMIN_PASSWORD = "admin-password"
+START = datetime(2024, 1, 1, 12)
+
+async def _admin_headers(client) -> dict:
+    await crud.create_user(schemas.UserCreate(username="admin", password=ADMIN_PASSWORD, role="admin"))
+    response = await client.post("/auth/token", data={"username": "admin", "password": ADMIN_PASSWORD})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def _etags(client) -> dict:
+    headers = await _admin_headers(client)
+    channel = await crud.create_channel(schemas.TVChannelCreate(name="Channel", country="UA"))
+    program = await crud.create_tv_program(schemas.TVProgramCreate(
+        title="Program", description="d", start_time=START, end_time=START + timedelta(hours=1), channel_id=str(channel.id),
+    ))
+    url = f"/programs/{program.id}"
+
+    patched = await client.patch(url, json={"title": "Renamed"}, headers=headers)
+    fetched = await client.get(url)
+    again = await client.patch(url, json={"title": "Again"}, headers={**headers, "If-Match": patched.headers["etag"]})
+    return {
+        "same body": patched.json() == fetched.json(),
+        "same etag": patched.headers["etag"] == fetched.headers["etag"],
+        "if-match": again.status_code,
+    }
+
+def test_patch_etag_matches_get(run_with_app):
+    assert run_with_app(_etags) == {"same body": True, "same etag": True, "if-match": 200}
@@ -0,0 +1,37 @@
+"""Програма з кінцем не пізніше за початок відхиляється з 422 і в PUT, і в PATCH."""
+from datetime import datetime, timedelta
+
+import crud
+import schemas
+
+ADMIN_PASSWORD = "admin-password"
+START = datetime(2024, 1, 1, 12)
+
+async def _admin_headers(client) -> dict:
+    await crud.create_user(schemas.UserCreate(username="admin", password=ADMIN_PASSWORD, role="admin"))
+    response = await client.post("/auth/token", data={"username": "admin", "password": ADMIN_PASSWORD})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def _invalid_times_statuses(client) -> dict:
+    headers = await _admin_headers(client)
+    channel = await crud.create_channel(schemas.TVChannelCreate(name="Channel", country="UA"))
+    program = await crud.create_tv_program(schemas.TVProgramCreate(
+        title="Program", description="d", start_time=START, end_time=START + timedelta(hours=1), channel_id=str(channel.id),
+    ))
+    url = f"/programs/{program.id}"
+    body = {"title": "Program", "description": "d", "channel_id": str(channel.id)}
+
+    statuses = {}
+    response = await client.put(url, json={**body, "start_time": START.isoformat(), "end_time": START.isoformat()}, headers=headers)
+    statuses["put"] = response.status_code
+    response = await client.patch(url, json={"start_time": START.isoformat(), "end_time": (START - timedelta(hours=1)).isoformat()}, headers=headers)
+    statuses["patch both"] = response.status_code
+    # Лише кінець, раніший за збережений початок - перевіряє вже crud (InvalidProgramTimesError)
+    response = await client.patch(url, json={"end_time": (START - timedelta(minutes=5)).isoformat()}, headers=headers)
+    statuses["patch end"] = response.status_code
+    statuses["unchanged"] = (await client.get(url)).json()["end_time"] == (START + timedelta(hours=1)).isoformat()
+    return statuses
+
+def test_end_before_start_is_rejected_with_422(run_with_app):
+    statuses = run_with_app(_invalid_times_statuses)
+    assert statuses == {"put": 422, "patch both": 422, "patch end": 422, "unchanged": True}
@@ -0,0 +1,52 @@
+"""Запит сітки мовлення (crud.get_schedule) читає індекс channel_start_end_index, а не всю колекцію."""
+from datetime import datetime, timedelta
+from typing import Iterator
+
+from pymongo import ASCENDING
+
+import crud
+import schemas
+from models import TVProgram
+
+CHANNELS = 10
+PROGRAMS_PER_CHANNEL = 200
+SCHEDULE_START = datetime(2024, 1, 1)
+
+def _plan_stages(plan: dict) -> Iterator[dict]:
+    """Усі стадії плану запиту (вкладені в inputStage / inputStages / queryPlan)."""
+    yield plan
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _plan_stages(plan[key])
+    for stage in plan.get("inputStages", []):
+        yield from _plan_stages(stage)
+
+async def _explain_schedule_query() -> dict:
+    channels = [
+        await crud.create_channel(schemas.TVChannelCreate(name=f"Channel {i}", country="UA"))
+        for i in range(CHANNELS)
+    ]
+    rows = (
+        (row, {
+            "title": f"Program {row}",
+            "description": "Test programme",
+            "start_time": SCHEDULE_START + timedelta(hours=row // CHANNELS),
+            "end_time": SCHEDULE_START + timedelta(hours=row // CHANNELS + 1),
+            "channel_id": str(channels[row % CHANNELS].id),
+        })
+        for row in range(CHANNELS * PROGRAMS_PER_CHANNEL)
+    )
+    report = await crud.bulk_create_tv_programs(rows)
+    assert report["failed"] == 0
+
+    # Той самий запит і сортування, що й у crud.get_schedule
+    start = SCHEDULE_START + timedelta(hours=100)
+    query = crud.program_window_query(start, start + timedelta(hours=6), [channels[0].id, channels[1].id])
+    return await TVProgram.get_motor_collection().find(query).sort("start_time", ASCENDING).explain()
+
+def test_schedule_query_uses_channel_start_end_index(run_with_db):
+    explain = run_with_db(_explain_schedule_query)
+    stages = list(_plan_stages(explain["queryPlanner"]["winningPlan"]))
+
+    assert "COLLSCAN" not in {stage.get("stage") for stage in stages}
+    assert "channel_start_end_index" in {stage.get("indexName") for stage in stages}
@@ -0,0 +1,10 @@
+"""Пошук програм без жодного фільтра відхиляється (інакше total і фасети рахуються по всій колекції)."""
+
+async def _search_statuses(client) -> dict:
+    return {
+        "no filter": (await client.get("/programs/search")).status_code,
+        "only paging": (await client.get("/programs/search", params={"limit": 5})).status_code,
+    }
+
+def test_search_requires_a_filter(run_with_app):
+    assert run_with_app(_search_statuses) == {"no filter": 422, "only paging": 422}
@@ -0,0 +1,126 @@
+import asyncio
+from datetime import datetime, timezone
+from itertools import islice
+from typing import AsyncIterator, BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from xml.etree.ElementTree import Element, ParseError, iterparse
+from xml.sax.saxutils import escape, quoteattr
+
+# Формат часу XMLTV: "20240101120000 +0200" (часовий пояс може бути відсутній)
+XMLTV_TIME_FORMAT = "%Y%m%d%H%M%S"
+# Скільки програм розбирати за один перехід у потік пулу (див. aiter_xmltv_programmes)
+XMLTV_PARSE_CHUNK_SIZE = 1000
+
+def parse_xmltv_time(value: str) -> datetime:
+    """Перетворює час у форматі XMLTV на naive UTC datetime."""
+    value = value.strip()
+    if " " in value:
+        parsed = datetime.strptime(value, XMLTV_TIME_FORMAT + " %z")
+        return parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return datetime.strptime(value[:14], XMLTV_TIME_FORMAT)
+
+def format_xmltv_time(value: datetime) -> str:
+    """Перетворює datetime (naive вважається UTC) на час у форматі XMLTV."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.strftime(XMLTV_TIME_FORMAT) + " +0000"
+
+def _child_text(element: Element, tag: str) -> str:
+    child = element.find(tag)
+    return (child.text or "").strip() if child is not None else ""
+
+def iter_xmltv_programmes(
+    source: BinaryIO,
+    channel_ids_by_name: Dict[str, str],
+) -> Iterator[Tuple[int, Union[dict, str]]]:
+    """
+    Потоково читає XMLTV-файл і повертає пари (номер програми, дані програми).
+    Якщо програму не вдалося розібрати, замість даних повертається текст помилки.
+
+    Канал програми шукається за display-name з елемента <channel> (або за самим XMLTV id)
+    у словнику channel_ids_by_name; невідомі канали передаються далі як є, щоб їх відхилила валідація.
+    """
+    xmltv_channel_ids: Dict[str, str] = {}
+    row = 0
+    try:
+        events = iterparse(source, events=("start", "end"))
+        _, root = next(events)
+        for event, element in events:
+            if event != "end":
+                continue
+            if element.tag == "channel":
+                xmltv_id = element.get("id", "")
+                for display_name in element.iter("display-name"):
+                    name = (display_name.text or "").strip()
+                    if name in channel_ids_by_name:
+                        xmltv_channel_ids[xmltv_id] = channel_ids_by_name[name]
+                        break
+                root.clear()
+            elif element.tag == "programme":
+                try:
+                    xmltv_id = element.get("channel", "")
+                    tags = [(category.text or "").strip() for category in element.iter("category") if category.text]
+                    yield row, {
+                        "title": _child_text(element, "title"),
+                        "description": _child_text(element, "desc"),
+                        "start_time": parse_xmltv_time(element.get("start", "")),
+                        "end_time": parse_xmltv_time(element.get("stop", "")),
+                        "channel_id": xmltv_channel_ids.get(xmltv_id) or channel_ids_by_name.get(xmltv_id, xmltv_id),
+                        "tags": tags or None,
+                    }
+                except ValueError as e:
+                    yield row, f"Invalid programme: {e}"
+                row += 1
+                # Звільняємо вже розібрані елементи, щоб великий файл не накопичувався в дереві
+                root.clear()
+    except ParseError as e:
+        # Зламаний XML: повідомляємо про помилку, вже розібрані програми лишаються у звіті
+        yield row, f"Invalid XMLTV file: {e}"
+
+async def aiter_xmltv_programmes(
+    source: BinaryIO,
+    channel_ids_by_name: Dict[str, str],
+    chunk_size: int = XMLTV_PARSE_CHUNK_SIZE,
+) -> AsyncIterator[Tuple[int, Union[dict, str]]]:
+    """
+    Те саме, що iter_xmltv_programmes, але розбір і читання файлу йдуть у потоці пулу
+    пачками по chunk_size програм, тож великий файл не блокує event loop.
+    """
+    programmes = iter_xmltv_programmes(source, channel_ids_by_name)
+    while True:
+        chunk = await asyncio.to_thread(lambda: list(islice(programmes, chunk_size)))
+        for item in chunk:
+            yield item
+        if len(chunk) < chunk_size:
+            return
+
+# --- Запис XMLTV ---
+
+XMLTV_FOOTER = "</tv>\n"
+
+def xmltv_header(channels: Iterable[Tuple[str, str]]) -> str:
+    """Початок XMLTV-документа з переліком каналів (пари XMLTV id, назва)."""
+    parts = ['<?xml version="1.0" encoding="UTF-8"?>\n<tv generator-info-name="tv-program-api">\n']
+    for xmltv_id, name in channels:
+        parts.append(f"  <channel id={quoteattr(xmltv_id)}><display-name>{escape(name)}</display-name></channel>\n")
+    return "".join(parts)
+
+def xmltv_programme(
+    xmltv_channel_id: str,
+    title: str,
+    description: str,
+    start_time: datetime,
+    end_time: datetime,
+    tags: Optional[List[str]] = None,
+) -> str:
+    """Один елемент <programme>."""
+    parts = [
+        f"  <programme start={quoteattr(format_xmltv_time(start_time))} "
+        f"stop={quoteattr(format_xmltv_time(end_time))} channel={quoteattr(xmltv_channel_id)}>",
+        f"<title>{escape(title)}</title>",
+    ]
+    if description:
+        parts.append(f"<desc>{escape(description)}</desc>")
+    for tag in tags or ():
+        parts.append(f"<category>{escape(tag)}</category>")
+    parts.append("</programme>\n")
+    return "".join(parts)